@@ -2,40 +2,71 @@ import os
 import numpy as np
 
 from pydicom._dicom_dict import DicomDictionary
+from .dicomscan import DICOM_MAGIC, DICOM_MAGIC_OFFSET, has_dicom_magic, scan_files, scan_files_parallel, \
+    iter_dicom_files, match_patterns, DicomScanProgress
+from .decompressor import Decompressor, decompress_file
+from .dictionaryindex import DicomDictionaryIndex, get_dictionary_index
+from .pixelcache import PixelCache, get_pixel_cache, read_dicom_pixels
 from .tag2numpy import Tag2NumPy
+from .tagheader import TagHeader, TagHeaderIndex
+
+
+__all__ = [
+    # Re-exported from submodules
+    'DICOM_MAGIC', 'DICOM_MAGIC_OFFSET', 'has_dicom_magic', 'scan_files', 'scan_files_parallel', 'iter_dicom_files',
+    'match_patterns', 'DicomScanProgress', 'Decompressor', 'decompress_file', 'DicomDictionaryIndex',
+    'get_dictionary_index', 'PixelCache', 'get_pixel_cache', 'read_dicom_pixels', 'Tag2NumPy', 'TagHeader',
+    'TagHeaderIndex',
+    # Defined here
+    'is_dicom_file', 'is_tag_file', 'get_tag_file_for_dicom', 'iter_dicom_tag_pairs', 'is_numpy_file',
+    'get_numpy_file_for_dicom', 'get_dicom_tag_for_name', 'get_dictionary_items', 'get_pixels', 'get_file_pixels',
+    'get_tag_pixels', 'is_compressed', 'decompress',
+]
 
 
 def is_dicom_file(file_path_or_obj):
-    file_obj = file_path_or_obj
-    if isinstance(file_obj, str):
-        if not os.path.isfile(file_obj):
+    if isinstance(file_path_or_obj, str):
+        if not os.path.isfile(file_path_or_obj):
             return False
-        if file_obj.startswith('._'):
+        if file_path_or_obj.startswith('._'):
             return False
-        file_obj = open(file_obj, "rb")
-    try:
-        result = file_obj.read(132).decode('ASCII')[-4:] == 'DICM'
-        file_obj.seek(0)
-        return result
-    except UnicodeDecodeError:
-        return False
+        return has_dicom_magic(file_path_or_obj)
+    result = file_path_or_obj.read(DICOM_MAGIC_OFFSET + len(DICOM_MAGIC))[DICOM_MAGIC_OFFSET:] == DICOM_MAGIC
+    file_path_or_obj.seek(0)
+    return result
 
 
 def is_tag_file(file_path):
     return file_path.endswith('.tag') and not file_path.startswith('._')
 
 
-def get_tag_file_for_dicom(dcm_file, ext='.tag'):
+def get_tag_file_for_dicom(dcm_file, ext='.tag', verbose=True):
     tag_file = os.path.splitext(dcm_file)[0] + ext
     if not os.path.isfile(tag_file):
         tag_file = dcm_file + ext
         if not os.path.isfile(tag_file):
-            print(f'Could not find TAG file for DICOM file {dcm_file}')
+            if verbose:
+                print(f'Could not find TAG file for DICOM file {dcm_file}')
             return None
         return tag_file
     return tag_file
 
 
+def iter_dicom_tag_pairs(d, verbose=True):
+    """ Yields (DICOM file, TAG file) for each DICOM file in directory tree d that has a TAG
+    file. DICOM files without one are skipped and, if verbose, counted in a single message
+    """
+    nr_skipped = 0
+    for dcm_file in iter_dicom_files(d):
+        tag_file = get_tag_file_for_dicom(dcm_file, verbose=False)
+        if tag_file is None:
+            nr_skipped += 1
+            continue
+        yield dcm_file, tag_file
+    if verbose and nr_skipped > 0:
+        print(f'Could not find TAG file for {nr_skipped} DICOM files in {d}')
+
+
 def is_numpy_file(file_path):
     return file_path.endswith('.npy') and not file_path.startswith('._')
 
@@ -45,10 +76,14 @@ def get_numpy_file_for_dicom(dcm_file):
 
 
 def get_dicom_tag_for_name(name):
-    for key, value in DicomDictionary.items():
-        if name == value[4]:
-            return hex(int(key))
-    return None
+    # Keywords (e.g. PixelSpacing) first, then names (e.g. Pixel Spacing)
+    index = get_dictionary_index()
+    key = index.get_tag_for_keyword(name)
+    if key is None:
+        key = index.get_tag_for_name(name)
+    if key is None:
+        return None
+    return hex(int(key))
 
 
 def get_dictionary_items():
@@ -68,8 +103,17 @@ def get_pixels(p, normalize=False):
     return pixels
 
 
-def get_tag_pixels(f, shape=None):
+def get_file_pixels(f, normalize=False):
+    """ Returns the pixels of DICOM file f, rescaled to HU if normalize is True, through the
+    shared pixel cache. The array is read-only, use get_pixels() for a writable copy of a dataset
+    """
+    return read_dicom_pixels(f, normalize=normalize)
+
+
+def get_tag_pixels(f, shape=None, mmap=False, infer_shape=False):
     converter = Tag2NumPy(shape)
+    converter.set_mmap_enabled(mmap)
+    converter.set_infer_shape_enabled(infer_shape)
     converter.set_input_tag_file_path(f)
     converter.execute()
     return converter.get_output_numpy_array()
@@ -84,12 +128,12 @@ def is_compressed(p):
 
 
 def decompress(f, reuse_name=False):
-    result = os.system('which gdcmconv>/dev/null')
-    if result > 0:
-        raise RuntimeError('Tool "gdcmconv" is not installed')
+    """ Writes an uncompressed copy of DICOM file f next to it as <name>_raw<ext> and returns
+    its path. Files that are already uncompressed are copied without decoding, so the returned
+    file is never f itself
+    """
     items = os.path.splitext(f)
     base_name, extension = items[0], items[1]
     f_target = base_name + '_raw' + extension
-    command = 'gdcmconv --raw {} {}'.format(f, f_target)
-    os.system(command)
+    decompress_file(f, f_target, copy_uncompressed=True)
     return f_target
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from barbell2light.dicom import get_tag_pixels, iter_dicom_tag_pairs
+from barbell2light.dicom.geometry import get_dicom_geometry
+from barbell2light.dicom.pixelcache import read_dicom_pixels, disable_pixel_cache
+
+
+# Same labels as used by Tag2Dcm.get_color_map()
+BODY_COMPOSITION_LABELS = {1: 'muscle', 2: 'IMAT', 5: 'VAT', 7: 'SAT'}
+
+
+def calculate_body_composition(dcm_file, tag_file, labels=None):
+    """ Calculates pixel count, area (cm2) and mean and standard deviation of HU for each label
+    of a DICOM+TAG pair. All labels are handled together with np.bincount, so the pixels are
+    traversed once per statistic instead of once per label.
+    """
+    labels = labels or BODY_COMPOSITION_LABELS
+    pixels = read_dicom_pixels(dcm_file, normalize=True).ravel()
+    pixels_tag = get_tag_pixels(tag_file, shape=None, mmap=True)
+    if pixels_tag.size != pixels.size:
+        raise RuntimeError('TAG file {} does not match size of DICOM file {}'.format(tag_file, dcm_file))
+    spacing = get_dicom_geometry(dcm_file).pixel_spacing
+    pixel_area = spacing[0] * spacing[1] / 100.0
+    counts = np.bincount(pixels_tag, minlength=256)
+    sums = np.bincount(pixels_tag, weights=pixels, minlength=256)
+    sums_squared = np.bincount(pixels_tag, weights=pixels * pixels, minlength=256)
+    result = {'dcm_file': dcm_file, 'tag_file': tag_file}
+    for label, name in labels.items():
+        count = int(counts[label])
+        mean, std = np.nan, np.nan
+        if count > 0:
+            mean = sums[label] / count
+            std = np.sqrt(max(sums_squared[label] / count - mean * mean, 0.0))
+        result['{}_pixels'.format(name)] = count
+        result['{}_area_cm2'.format(name)] = count * pixel_area
+        result['{}_mean_hu'.format(name)] = mean
+        result['{}_std_hu'.format(name)] = std
+    return result
+
+
+def _calculate_body_composition(args):
+    dcm_file, tag_file, labels = args
+    try:
+        return dcm_file, calculate_body_composition(dcm_file, tag_file, labels), None
+    except Exception as e:
+        return dcm_file, None, str(e)
+
+
+class BodyCompositionCalculator(object):
+    """ Calculates body composition statistics for a cohort of DICOM+TAG pairs across a
+    process pool and returns them as a DataFrame with one row per slice. Slices that fail
+    get no row, their errors are kept in get_errors().
+    """
+
+    def __init__(self):
+        self._input_files = []
+        self._labels = dict(BODY_COMPOSITION_LABELS)
+        self._nr_workers = os.cpu_count()
+        self._output_data_frame = None
+        self._errors = None
+
+    def set_input_files(self, dcm_and_tag_files):
+        self._input_files = list(dcm_and_tag_files)
+
+    def set_input_dir(self, d):
+        self._input_files = list(iter_dicom_tag_pairs(d))
+
+    def set_labels(self, labels):
+        self._labels = labels
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def get_output_data_frame(self):
+        return self._output_data_frame
+
+    def get_errors(self):
+        return self._errors
+
+    def execute(self):
+        self._errors = {}
+        rows = []
+        args = [(dcm_file, tag_file, self._labels) for dcm_file, tag_file in self._input_files]
+        with ProcessPoolExecutor(max_workers=self._nr_workers, initializer=disable_pixel_cache) as executor:
+            for dcm_file, row, error in executor.map(_calculate_body_composition, args, chunksize=8):
+                if error is not None:
+                    self._errors[dcm_file] = error
+                    print('Error: could not calculate body composition for {}: {}'.format(dcm_file, error))
+                    continue
+                rows.append(row)
+        self._output_data_frame = pd.DataFrame(rows)
+        return self._output_data_frame
+
+
+if __name__ == '__main__':
+    calculator = BodyCompositionCalculator()
+    calculator.set_input_files([('../../data/10.dcm', '../../data/10.tag')])
+    print(calculator.execute().T)
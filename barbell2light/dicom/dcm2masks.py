@@ -3,6 +3,8 @@ import json
 import numpy as np
 import SimpleITK as sitk
 
+from .masks import get_label_masks, save_packed_masks
+
 
 class Dcm2Masks(object):
 
@@ -12,6 +14,7 @@ class Dcm2Masks(object):
         self._output_dir = None
         self._output_file_paths = None
         self._overwrite_output = False
+        self._output_mode = 'dicom'
 
     # INTERFACE
 
@@ -30,6 +33,14 @@ class Dcm2Masks(object):
     def set_overwrite_output(self, value):
         self._overwrite_output = value
 
+    def set_output_mode(self, output_mode):
+        """ Sets how masks are written: 'dicom' (one 8-bit DICOM per label) or 'packed' (all
+        masks with 1 bit per pixel in a single compressed .npz file)
+        """
+        if output_mode not in ('dicom', 'packed'):
+            raise RuntimeError('Unknown output mode {}'.format(output_mode))
+        self._output_mode = output_mode
+
     def get_output_file_paths(self):
         return self._output_file_paths
 
@@ -50,54 +61,44 @@ class Dcm2Masks(object):
 
     @staticmethod
     def extract_pixels_by_label(pixels, label):
-        pixels_copy = np.copy(pixels)
-        pixels_copy[pixels_copy != label] = np.uint16(0)
-        pixels_copy[pixels_copy == label] = np.uint16(1)
-        return pixels_copy
+        return (pixels == label).astype(pixels.dtype)
+
+    def _write_image(self, pixels, reference_image, file_path):
+        image = sitk.GetImageFromArray(pixels)
+        image.CopyInformation(reference_image)
+        writer = sitk.ImageFileWriter()
+        writer.SetFileName(file_path)
+        writer.SetImageIO('GDCMImageIO')
+        writer.Execute(image)
+        return file_path
 
     def execute(self):
         os.makedirs(self._output_dir, exist_ok=True)
         file_base_name = os.path.splitext(self._input_dicom_file_path)[0]
         label_map = self._get_int16_label_map(self._label_map)
-        file_paths = {}
-        for label in label_map.keys():
-
-            # f = open(self._input_dicom_file_path, 'rb')
-            # p = pydicom.read_file(f)
-            # f.close()
-            # pixels = p.pixel_array.flat
-            # pixels = self.extract_pixels_by_label(pixels, label)
-            # p.PixelData = pixels.tobytes()
-            # file_path = os.path.join(self._output_dir, '{}_{}.dcm'.format(file_base_name, label_map[label]))
-            # try:
-            #     os.stat(file_path)
-            #     if not self._overwrite_output:
-            #         print('Error: file {} already exists!'.format(file_path))
-            #         return
-            # except FileNotFoundError:
-            #     pass
-            # p.save_as(file_path)
-            # file_paths[label_map[label]] = file_path
-
-            reader = sitk.ImageFileReader()
-            reader.SetImageIO('GDCMImageIO')
-            reader.SetFileName(self._input_dicom_file_path)
-            image = reader.Execute()
-            image_new = self._threshold_image(image, label)
-            writer = sitk.ImageFileWriter()
-            file_path = os.path.join(self._output_dir, '{}_{}.dcm'.format(file_base_name, label_map[label]))
-            try:
-                os.stat(file_path)
-                if not self._overwrite_output:
-                    print('Error: file {} already exists!'.format(file_path))
-                    return
-            except FileNotFoundError:
-                pass
-            writer.SetFileName(file_path)
-            file_paths[label_map[label]] = file_path
-            writer.SetImageIO('GDCMImageIO')
-            writer.Execute(image_new)
-
+        labels = list(label_map.keys())
+        if self._output_mode == 'dicom':
+            file_paths = {
+                label_map[label]: os.path.join(self._output_dir, '{}_{}.dcm'.format(file_base_name, label_map[label]))
+                for label in labels}
+        else:
+            # All label names point to the same file, see load_packed_masks()
+            file_path = os.path.join(self._output_dir, '{}_masks.npz'.format(file_base_name))
+            file_paths = {label_map[label]: file_path for label in labels}
+        for file_path in set(file_paths.values()):
+            if os.path.isfile(file_path) and not self._overwrite_output:
+                print('Error: file {} already exists!'.format(file_path))
+                return
+        reader = sitk.ImageFileReader()
+        reader.SetImageIO('GDCMImageIO')
+        reader.SetFileName(self._input_dicom_file_path)
+        image = reader.Execute()
+        masks = get_label_masks(sitk.GetArrayViewFromImage(image), labels)
+        if self._output_mode == 'dicom':
+            for i, label in enumerate(labels):
+                self._write_image(masks[i], image, file_paths[label_map[label]])
+        else:
+            save_packed_masks(file_path, masks, [label_map[label] for label in labels])
         self._output_file_paths = file_paths
 
 
@@ -1,6 +1,8 @@
 import os
 import SimpleITK as sitk
 
+from .niftiwriter import NiftiWriter
+
 
 class Dcm2Nifti(object):
 
@@ -13,6 +15,7 @@ class Dcm2Nifti(object):
         self._origin = None
         self._direction = None
         self._overwrite_output = False
+        self._nifti_writer = NiftiWriter()
 
     def set_input_dicom_file_path(self, file_path):
         self._input_dicom_file_path = file_path
@@ -23,6 +26,10 @@ class Dcm2Nifti(object):
     def set_overwrite_output(self, value):
         self._overwrite_output = value
 
+    def set_output_format(self, output_format, compression_level=None, nr_threads=1):
+        """ Sets output format 'nii' or 'nii.gz', see NiftiWriter """
+        self._nifti_writer.set_output_format(output_format, compression_level, nr_threads)
+
     def get_output_file_path(self):
         return self._output_file_path
 
@@ -36,7 +43,7 @@ class Dcm2Nifti(object):
         file_name = file_name[1]
         file_name = os.path.splitext(file_name)
         file_name = file_name[0]
-        file_name = '{}.nii.gz'.format(file_name)
+        file_name = '{}{}'.format(file_name, self._nifti_writer.get_extension())
         file_path = os.path.join(self._output_dir, file_name)
         try:
             os.stat(file_path)
@@ -46,10 +53,7 @@ class Dcm2Nifti(object):
         except FileNotFoundError:
             pass
         self._output_file_path = file_path
-        writer = sitk.ImageFileWriter()
-        writer.SetFileName(self._output_file_path)
-        writer.SetImageIO('NiftiImageIO')
-        writer.Execute(image)
+        self._nifti_writer.execute(image, self._output_file_path)
         print('Written {}'.format(self._output_file_path))
 
 
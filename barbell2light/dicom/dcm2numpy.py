@@ -1,6 +1,4 @@
-import pydicom
-
-import numpy as np
+from .pixelcache import read_dicom_pixels
 
 
 class Dcm2Numpy(object):
@@ -26,13 +24,10 @@ class Dcm2Numpy(object):
     def execute(self):
         if self._input_dicom_file_path is None:
             raise RuntimeError('Input DICOM file path not set')
-        p = pydicom.read_file(self._input_dicom_file_path)
-        self._shape = (p.Rows, p.Columns)
-        self._output_numpy_array = p.pixel_array.reshape(self._shape)
-        if self._normalize_enabled:
-            b = p.RescaleIntercept
-            m = p.RescaleSlope
-            self._output_numpy_array = m * self._output_numpy_array + b
+        # Pixels come from the shared pixel cache, copy them so callers can modify the output
+        pixels = read_dicom_pixels(self._input_dicom_file_path, normalize=self._normalize_enabled)
+        self._output_numpy_array = pixels.copy()
+        self._shape = self._output_numpy_array.shape
         # print('{}, {}'.format(np.min(self._output_numpy_array), np.max(self._output_numpy_array)))
 
 
@@ -1,6 +1,11 @@
 import os
-import pydicom
-import matplotlib.pyplot as plt
+
+from concurrent.futures import ProcessPoolExecutor
+
+from . import iter_dicom_files
+from .pixelcache import disable_pixel_cache
+from .pngwriter import write_png, get_thumbnail
+from .windowing import DEFAULT_CT_WINDOW, apply_ct_window, window_dicom_pixels
 
 
 class Dcm2Png:
@@ -12,6 +17,10 @@ class Dcm2Png:
         self.png_figure_size = (10, 10)
         self.output_dir = os.path.abspath(os.path.curdir)
         self.verbose = False
+        self.fast_png_enabled = False
+        self.thumbnail_size = None
+        self.ct_windows = [DEFAULT_CT_WINDOW]
+        self.output_png_files = None
 
     def set_png_figure_size(self, png_figure_size):
         self.png_figure_size = png_figure_size
@@ -19,6 +28,20 @@ class Dcm2Png:
     def get_png_figure_size(self):
         return self.png_figure_size
 
+    def set_fast_png_enabled(self, enabled=True):
+        """ Writes the windowed pixels directly as PNG instead of rendering a matplotlib figure """
+        self.fast_png_enabled = enabled
+
+    def set_thumbnail_size(self, thumbnail_size):
+        """ Downscales PNGs written by the fast PNG path to at most thumbnail_size pixels """
+        self.thumbnail_size = thumbnail_size
+
+    def set_ct_windows(self, ct_windows):
+        """ Sets the CT window presets (see windowing.CT_WINDOW_PRESETS) or (width, level) pairs
+        to render. With more than one window a PNG is written for each, named after the window
+        """
+        self.ct_windows = list(ct_windows)
+
     def set_output_dir(self, output_dir):
         if not os.path.isdir(output_dir):
             if self.verbose:
@@ -31,26 +54,79 @@ class Dcm2Png:
 
     @staticmethod
     def apply_ct_window(pix, window):
-        result = (pix - window[1] + 0.5 * window[0])/window[0]
-        result[result < 0] = 0
-        result[result > 1] = 1
-        return result
+        return apply_ct_window(pix, window)
+
+    def _get_output_png_file(self, ct_window):
+        if len(self.ct_windows) == 1:
+            return os.path.join(self.output_dir, self.dcm_file_name + '.png')
+        if not isinstance(ct_window, str):
+            ct_window = '{}_{}'.format(*ct_window)
+        return os.path.join(self.output_dir, '{}_{}.png'.format(self.dcm_file_name, ct_window))
 
     def execute(self):
-        p = pydicom.dcmread(self.dcm_file)
-        if p.file_meta.TransferSyntaxUID.is_compressed:
-            p.decompress()
-        pixels = p.pixel_array
-        pixels = pixels * p.RescaleSlope + p.RescaleIntercept
-        pixels = self.apply_ct_window(pixels, [400, 50])
-        pixels = pixels.astype(float)
+        self.output_png_files = {}
+        for ct_window, pixels in zip(self.ct_windows, window_dicom_pixels(self.dcm_file, self.ct_windows)):
+            output_png_file = self._get_output_png_file(ct_window)
+            if self.fast_png_enabled:
+                self._write_fast_png(pixels, output_png_file)
+            else:
+                self._write_matplotlib_png(pixels, output_png_file)
+            self.output_png_files[ct_window if isinstance(ct_window, str) else tuple(ct_window)] = output_png_file
+        self.output_png_file = list(self.output_png_files.values())[0]
+
+    def _write_fast_png(self, pixels, output_png_file):
+        if self.thumbnail_size:
+            pixels = get_thumbnail(pixels, self.thumbnail_size)
+        write_png(output_png_file, pixels)
+
+    def _write_matplotlib_png(self, pixels, output_png_file):
+        import matplotlib.pyplot as plt
         fig = plt.figure(figsize=self.png_figure_size)
         ax = fig.add_subplot(1, 1, 1)
-        plt.imshow(pixels, cmap='gray')
+        plt.imshow(pixels, cmap='gray', vmin=0, vmax=255)
         ax.axis('off')
-        self.output_png_file = os.path.join(self.output_dir, self.dcm_file_name + '.png')
-        plt.savefig(self.output_png_file, bbox_inches='tight')
+        plt.savefig(output_png_file, bbox_inches='tight')
         plt.close('all')
 
     def get_output_png_file(self):
         return self.output_png_file
+
+    def get_output_png_files(self):
+        return self.output_png_files
+
+
+def _dcm2png(args):
+    dcm_file, output_dir, thumbnail_size = args
+    try:
+        converter = Dcm2Png(dcm_file)
+        converter.set_output_dir(output_dir)
+        converter.set_fast_png_enabled(True)
+        converter.set_thumbnail_size(thumbnail_size)
+        converter.execute()
+        return dcm_file, converter.get_output_png_file(), None
+    except Exception as e:
+        return dcm_file, None, str(e)
+
+
+def dcm2png_dir(d, output_dir, thumbnail_size=None, nr_workers=None):
+    """ Converts all DICOM files in directory tree d to PNG using the fast PNG path in a
+    process pool. The PNGs are written to the same relative subdirectories of output_dir, so
+    files with the same name in different directories do not overwrite each other. Returns
+    the PNG files written and {dcm_file: error} for files that could not be converted
+    """
+    args = []
+    for f in iter_dicom_files(d):
+        f_output_dir = os.path.join(output_dir, os.path.relpath(os.path.dirname(f), d))
+        args.append((f, os.path.normpath(f_output_dir), thumbnail_size))
+    # Created up front, since workers creating the same directory would race
+    for f_output_dir in set([arg[1] for arg in args]) | {output_dir}:
+        os.makedirs(f_output_dir, exist_ok=True)
+    png_files, errors = [], {}
+    with ProcessPoolExecutor(max_workers=nr_workers, initializer=disable_pixel_cache) as executor:
+        for dcm_file, png_file, error in executor.map(_dcm2png, args, chunksize=8):
+            if error is not None:
+                errors[dcm_file] = error
+                print('Error: {}: {}'.format(dcm_file, error))
+                continue
+            png_files.append(png_file)
+    return png_files, errors
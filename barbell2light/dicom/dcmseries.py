@@ -0,0 +1,115 @@
+import os
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from barbell2light.dicom import is_dicom_file
+from .geometry import get_dicom_geometry
+from .pixelcache import read_dicom_pixels
+
+
+class DicomSeries(object):
+    """ Lazily loaded 3D volume of an ordered list of DICOM slices. Indexing returns a single
+    decoded slice, get_volume() decodes all slices in parallel into one preallocated array.
+    """
+
+    def __init__(self, series_instance_uid, files):
+        self._series_instance_uid = series_instance_uid
+        self._files = self.sort_files(files)
+        self._normalize_enabled = False
+        self._nr_workers = os.cpu_count()
+
+    @staticmethod
+    def sort_files(files):
+        geometries = [get_dicom_geometry(f) for f in files]
+        if all([g.has_image_position for g in geometries]):
+            keys = [g.get_slice_location() for g in geometries]
+        elif all([g.instance_number is not None for g in geometries]):
+            keys = [g.instance_number for g in geometries]
+        else:
+            return list(files)
+        return [f for _, f in sorted(zip(keys, files), key=lambda x: x[0])]
+
+    def set_normalize_enabled(self, enabled=True):
+        self._normalize_enabled = enabled
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def get_series_instance_uid(self):
+        return self._series_instance_uid
+
+    def get_files(self):
+        return self._files
+
+    def get_geometry(self):
+        return get_dicom_geometry(self._files[0])
+
+    def get_shape(self):
+        return (len(self._files), *self.get_geometry().get_shape())
+
+    def get_spacing(self):
+        """ Returns (column spacing, row spacing, slice spacing). Slice spacing is derived from
+        the slice positions and falls back on SliceThickness for single slices.
+        """
+        geometry = self.get_geometry()
+        # PixelSpacing holds the row spacing (between rows) first, then the column spacing
+        row_spacing, column_spacing, slice_spacing = geometry.get_spacing()
+        if len(self._files) > 1 and geometry.has_image_position:
+            locations = [get_dicom_geometry(f).get_slice_location() for f in self._files]
+            slice_spacing = float(np.median(np.abs(np.diff(locations))))
+        return column_spacing, row_spacing, slice_spacing
+
+    def __len__(self):
+        return len(self._files)
+
+    def __getitem__(self, i):
+        return read_dicom_pixels(self._files[i], normalize=self._normalize_enabled)
+
+    def get_volume(self):
+        first = self[0]
+        shape = self.get_shape()
+        if first.shape != shape[1:]:
+            raise RuntimeError('Slice shape {} does not match series shape {}'.format(first.shape, shape[1:]))
+        volume = np.empty(shape, dtype=first.dtype)
+        volume[0] = first
+
+        def load_slice(i):
+            pixels = self[i]
+            if pixels.shape != shape[1:]:
+                raise RuntimeError('Slice {} has shape {} instead of {}'.format(
+                    self._files[i], pixels.shape, shape[1:]))
+            volume[i] = pixels
+
+        with ThreadPoolExecutor(max_workers=self._nr_workers) as executor:
+            list(executor.map(load_slice, range(1, len(self._files))))
+        return volume
+
+
+class DicomSeriesLoader(object):
+    """ Groups DICOM files by SeriesInstanceUID using header-only reads """
+
+    def __init__(self):
+        self._input_files = []
+        self._output_series = None
+
+    def set_input_files(self, files):
+        self._input_files = files
+
+    def set_input_dir(self, d):
+        self._input_files = []
+        for root, dirs, files in os.walk(d):
+            for f in files:
+                f = os.path.join(root, f)
+                if is_dicom_file(f):
+                    self._input_files.append(f)
+
+    def get_output_series(self):
+        return self._output_series
+
+    def execute(self):
+        files_by_series = {}
+        for f in self._input_files:
+            files_by_series.setdefault(get_dicom_geometry(f).series_instance_uid, []).append(f)
+        self._output_series = {uid: DicomSeries(uid, files) for uid, files in files_by_series.items()}
+        return self._output_series
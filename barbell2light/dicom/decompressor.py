@@ -0,0 +1,69 @@
+import os
+import shutil
+import pydicom
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+def decompress_file(f, f_target, copy_uncompressed=False):
+    """ Decompresses DICOM file f in-process, using the pixel data handlers installed for
+    pydicom (python-gdcm, pylibjpeg), and writes it as Explicit VR Little Endian to f_target.
+    Files that are not compressed are not decoded. They are copied to f_target if
+    copy_uncompressed is True and skipped otherwise. Returns 'decompressed', 'copied' or
+    'skipped'.
+    """
+    p = pydicom.dcmread(f, stop_before_pixels=True)
+    if not p.file_meta.TransferSyntaxUID.is_compressed:
+        if copy_uncompressed:
+            shutil.copy(f, f_target)
+            return 'copied'
+        return 'skipped'
+    p = pydicom.dcmread(f)
+    p.decompress()
+    # pydicom keeps the VR of the encapsulated pixel data (OB), native 16-bit pixels are OW
+    p['PixelData'].VR = 'OW' if p.BitsAllocated > 8 else 'OB'
+    p.save_as(f_target)
+    return 'decompressed'
+
+
+def _decompress_file(args):
+    f, f_target, copy_uncompressed = args
+    try:
+        return f, f_target, decompress_file(f, f_target, copy_uncompressed)
+    except Exception as e:
+        return f, f_target, 'error: {}'.format(e)
+
+
+class Decompressor(object):
+    """ Decompresses many DICOM files in parallel across a pool of worker processes """
+
+    def __init__(self):
+        self._nr_workers = os.cpu_count()
+        self._copy_uncompressed = False
+        self._verbose = False
+        self._results = None
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_copy_uncompressed(self, copy_uncompressed):
+        self._copy_uncompressed = copy_uncompressed
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_results(self):
+        return self._results
+
+    def execute(self, files, target_files):
+        """ Decompresses each file in files to the corresponding file in target_files and
+        returns a dictionary with the result (see decompress_file()) for each file.
+        """
+        args = [(f, f_target, self._copy_uncompressed) for f, f_target in zip(files, target_files)]
+        self._results = {}
+        with ProcessPoolExecutor(max_workers=self._nr_workers) as executor:
+            for f, f_target, result in executor.map(_decompress_file, args, chunksize=8):
+                self._results[f] = result
+                if self._verbose:
+                    print('{}: {}'.format(f, result))
+        return self._results
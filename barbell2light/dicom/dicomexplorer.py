@@ -1,14 +1,22 @@
 import os
 import cmd2
 import pydicom
+import pandas as pd
 
-from barbell2light.dicom import is_dicom_file, get_dicom_tag_for_name, get_dictionary_items
+from barbell2light.dicom import is_dicom_file, iter_dicom_files, get_dicom_tag_for_name, get_dictionary_index, \
+    DicomScanProgress
+from barbell2light.dicom.decompressor import Decompressor
+from barbell2light.dicom.dicomheaderindex import DicomHeaderIndex
+from barbell2light.dicom.dicomtagextractor import DicomTagExtractor, save_data_frame
+from barbell2light.dicom.pixelchecker import PixelChecker
 
 
 class DicomExplorer:
 
     def __init__(self):
         self.files = []
+        self.header_index = None
+        self.pixel_check_report = None
 
     # LOAD
 
@@ -21,32 +29,75 @@ class DicomExplorer:
             self.files.append(f)
             if verbose:
                 print(f)
+            if self.header_index is not None:
+                self.header_index.update([f], verbose=verbose)
 
-    def load_dir(self, d, verbose=True):
+    def iter_dir(self, d, include=None, exclude=None, max_files=None, nr_workers=16, verbose=True,
+                 progress_interval=1.0):
+        """ Loads the DICOM files in directory tree d and yields each one as soon as it is
+        found. Subdirectories are scanned concurrently. Only files matching the <include> and
+        none of the <exclude> patterns are loaded, at most <max_files>. If verbose, progress
+        (files/s, ETA) is printed every <progress_interval> seconds
+        """
         if not os.path.isdir(d):
             if verbose:
                 print('Cannot find directory {}'.format(d))
             return
-        for root, dirs, files in os.walk(d):
-            for f in files:
-                f = os.path.join(root, f)
-                self.load_file(f, verbose)
+        progress = DicomScanProgress()
+        last_report = progress.get_elapsed()
+        nr_loaded = 0
+        # Small batches so the first files come out right away
+        for f in iter_dicom_files(d, nr_workers, batch_size=32, include=include, exclude=exclude,
+                                  nr_scan_workers=nr_workers, progress=progress):
+            self.files.append(f)
+            nr_loaded += 1
+            yield f
+            if verbose and progress.get_elapsed() - last_report >= progress_interval:
+                last_report = progress.get_elapsed()
+                print(progress)
+            if max_files is not None and nr_loaded >= max_files:
+                break
+        if verbose:
+            print(progress)
+
+    def load_dir(self, d, verbose=True, include=None, exclude=None, max_files=None):
+        for _ in self.iter_dir(d, include, exclude, max_files, verbose=verbose):
+            pass
         if verbose:
             print('Loaded {} files'.format(len(self.files)))
+        if self.header_index is not None:
+            self.header_index.update(self.files, verbose=verbose)
+
+    # INDEX
+
+    def open_header_index(self, db_file, verbose=True):
+        """ Opens (or creates) the SQLite header index db_file and brings it up-to-date for the
+        loaded files. Tag value lookups are then served from the index. Only new or changed files
+        are read, also when files are loaded later on
+        """
+        if self.header_index is not None:
+            self.header_index.close()
+        self.header_index = DicomHeaderIndex(db_file)
+        self.header_index.update(self.files, verbose=verbose)
+        return self.header_index
+
+    def update_header_index(self, verbose=True):
+        if self.header_index is None:
+            raise RuntimeError('No header index opened')
+        return self.header_index.update(self.files, verbose=verbose)
 
     # CONVERT
 
-    def to_raw(self, d_out, verbose=True):
-        result = os.system('which gdcmconv>/dev/null')
-        if result > 0:
-            raise RuntimeError('Tool "gdcmconv" is not installed')
+    def to_raw(self, d_out, verbose=True, nr_workers=None):
         os.makedirs(d_out, exist_ok=False)
-        for f in self.files:
-            f_target = os.path.join(d_out, os.path.split(f)[1])
-            command = 'gdcmconv --raw {} {}'.format(f, f_target)
-            os.system(command)
-            if verbose:
-                print('Converted {}'.format(f))
+        decompressor = Decompressor()
+        # Files that are already uncompressed are copied as-is so the output directory is complete
+        decompressor.set_copy_uncompressed(True)
+        if nr_workers is not None:
+            decompressor.set_nr_workers(nr_workers)
+        decompressor.set_verbose(verbose)
+        target_files = [os.path.join(d_out, os.path.split(f)[1]) for f in self.files]
+        return decompressor.execute(self.files, target_files)
 
     # INSPECTION
 
@@ -69,44 +120,103 @@ class DicomExplorer:
 
     @staticmethod
     def get_tags(key_word='', verbose=True):
-        outputs = []
-        for key, value in get_dictionary_items():
-            output = '{}: {}'.format(key, value)
-            if key_word == '':
-                outputs.append(output)
-                if verbose:
-                    print(output)
-            else:
-                for item in value:
-                    if key_word in item:
-                        outputs.append(output)
-                        if verbose:
-                            print(output)
+        outputs = get_dictionary_index().find(key_word)
+        if verbose:
+            for output in outputs:
+                print(output)
         return outputs
 
     def get_tag_values(self, tag_name, verbose=True):
         tag = get_dicom_tag_for_name(tag_name)
         if verbose:
             print(tag)
+        if tag is None:
+            if verbose:
+                print('Unknown DICOM tag name {}'.format(tag_name))
+            return {}
+        if self.header_index is not None:
+            # Values from the index are JSON types, e.g. floats instead of DSfloat
+            values = self.header_index.get_tag_values(tag, self.files)
+            if verbose:
+                for f, value in values.items():
+                    print('{}: {}'.format(f, value))
+            return values
         values = {}
         for f in self.files:
-            p = pydicom.read_file(f)
-            if tag in list(p.keys()):
+            p = pydicom.dcmread(f, stop_before_pixels=True, specific_tags=[tag])
+            if tag in p:
                 values[f] = p[tag].value
                 if verbose:
                     print('{}: {}'.format(f, values[f]))
         return values
 
-    def check_pixels(self, verbose=True):
-        bad_files = []
-        for f in self.files:
-            p = pydicom.read_file(f)
-            try:
-                p.convert_pixel_data()
-            except NotImplementedError:
-                bad_files.append(f)
-                if verbose:
-                    print('ERROR: {}'.format(f))
+    def get_tag_values_data_frame(self, tag_names, output_file=None, nr_workers=None, verbose=True):
+        """ Returns a DataFrame with the values of all tags in <tag_names> for the loaded files,
+        one row per file. Values come from the header index if opened, otherwise only the requested
+        header elements are read in parallel. If <output_file> is given the DataFrame is also
+        written to it (.parquet or CSV)
+        """
+        tags = dict([(tag_name, get_dicom_tag_for_name(tag_name)) for tag_name in tag_names])
+        known_tag_names = [tag_name for tag_name in tag_names if tags[tag_name] is not None]
+        if verbose:
+            for tag_name in tag_names:
+                if tags[tag_name] is None:
+                    print('Unknown DICOM tag name {}'.format(tag_name))
+        if self.header_index is not None:
+            # Files that could not be indexed get no row, like files the extractor cannot read
+            indexed = set(self.header_index.get_files())
+            files = [f for f in self.files if f in indexed]
+            data = {'file': files}
+            for tag_name in known_tag_names:
+                values = self.header_index.get_tag_values(tags[tag_name], files)
+                data[tag_name] = [values.get(f) for f in files]
+            data_frame = pd.DataFrame(data)
+        else:
+            extractor = DicomTagExtractor()
+            extractor.set_input_files(self.files)
+            extractor.set_tag_names(known_tag_names)
+            extractor.set_verbose(verbose)
+            if nr_workers is not None:
+                extractor.set_nr_workers(nr_workers)
+            data_frame = extractor.execute()
+        # Unknown tags have no values, like get_tag_values()
+        data_frame = data_frame.reindex(columns=['file'] + list(tag_names))
+        if verbose:
+            print(data_frame)
+        if output_file is not None:
+            save_data_frame(data_frame, output_file)
+        return data_frame
+
+    def find_files(self, tag_name, value, verbose=True):
+        """ Returns the loaded files where tag <tag_name> has <value>, using the header index """
+        if self.header_index is None:
+            raise RuntimeError('No header index opened, use open_header_index() first')
+        tag = get_dicom_tag_for_name(tag_name)
+        if tag is None:
+            if verbose:
+                print('Unknown DICOM tag name {}'.format(tag_name))
+            return []
+        files = self.header_index.find_files(tag, value, self.files)
+        if verbose:
+            for f in files:
+                print(f)
+            print('Found {} files'.format(len(files)))
+        return files
+
+    def check_pixels(self, verbose=True, nr_workers=None):
+        """ Returns the loaded files whose pixel data cannot be decoded. The files are checked in
+        a process pool. A report of files, failures and decode times per transfer syntax and
+        pixel data handler is kept in pixel_check_report (and printed if verbose)
+        """
+        checker = PixelChecker()
+        checker.set_input_files(self.files)
+        checker.set_verbose(verbose)
+        if nr_workers is not None:
+            checker.set_nr_workers(nr_workers)
+        bad_files = checker.execute()
+        self.pixel_check_report = checker.get_report()
+        if verbose:
+            print(self.pixel_check_report.to_string())
         return bad_files
 
 
@@ -126,15 +236,35 @@ class DicomExplorerShell(cmd2.Cmd):
         self.explorer.load_file(f)
         self.poutput('Done')
 
-    def do_load_dir(self, d):
-        """ Usage: load_dir <directory>
+    load_dir_parser = cmd2.Cmd2ArgumentParser()
+    load_dir_parser.add_argument('directory')
+    load_dir_parser.add_argument('--include', action='append', help='Only load files matching pattern, e.g. *.dcm')
+    load_dir_parser.add_argument('--exclude', action='append', help='Skip files matching pattern')
+    load_dir_parser.add_argument('--max_files', type=int, help='Load at most this number of files')
+
+    @cmd2.with_argparser(load_dir_parser)
+    def do_load_dir(self, args):
+        """ Usage: load_dir <directory> [--include <pattern>] [--exclude <pattern>] [--max_files <n>]
         Loads all DICOM files (recursively) in given <directory>"""
-        self.explorer.load_dir(d)
+        self.explorer.load_dir(args.directory, include=args.include, exclude=args.exclude, max_files=args.max_files)
+        self.poutput('Done')
+
+    def do_open_index(self, db_file):
+        """ Usage: open_index <db_file>
+        Opens (or creates) SQLite header index <db_file> for the loaded DICOM files. Tag value lookups
+        are then served from the index, which is updated for new or changed files only"""
+        self.explorer.open_header_index(db_file)
+        self.poutput('Done')
+
+    def do_update_index(self, _):
+        """ Usage: update_index
+        Re-reads headers of loaded DICOM files that changed since they were indexed"""
+        self.explorer.update_header_index()
         self.poutput('Done')
 
     def do_to_raw(self, d_out='.'):
         """ Usage: to_raw
-        Converts all loaded DICOM files to RAW format using GDCM"""
+        Converts all loaded DICOM files to RAW format using the installed pixel data handlers"""
         self.explorer.to_raw(d_out)
         self.poutput('Done')
 
@@ -159,6 +289,24 @@ class DicomExplorerShell(cmd2.Cmd):
                 f.write('{}: {}\n'.format(k, tag_values[k]))
         self.poutput('Done (written string output to tag_values.txt)')
 
+    def do_extract_tags(self, args):
+        """ Usage: extract_tags <tag_name> [<tag_name> ...] [<output_file>]
+        For all loaded DICOM files, extract the values of all given tags into a table, one row per
+        file. The table is written to <output_file> (.csv or .parquet, default tag_values.csv)"""
+        tag_names = args.split()
+        output_file = 'tag_values.csv'
+        if len(tag_names) > 0 and tag_names[-1].endswith(('.csv', '.parquet')):
+            output_file = tag_names.pop()
+        data_frame = self.explorer.get_tag_values_data_frame(tag_names, output_file, verbose=False)
+        self.poutput('Done (written {} rows to {})'.format(len(data_frame), output_file))
+
+    def do_find_files(self, args):
+        """ Usage: find_files <tag_name> <value>
+        Show all loaded DICOM files where tag <tag_name> has <value>. Requires open_index"""
+        tag_name, value = args.split(None, 1)
+        self.explorer.find_files(tag_name, value)
+        self.poutput('Done')
+
     def do_check_pixels(self, _):
         """ Usage: check_pixels
         For all loaded DICOM files, check whether the pixels can be loaded into a NumPy array. If not,
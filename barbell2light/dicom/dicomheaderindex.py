@@ -0,0 +1,138 @@
+import os
+import json
+import sqlite3
+import pydicom
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Binary and nested elements are not indexed
+SKIPPED_VRS = ('SQ', 'OB', 'OD', 'OF', 'OL', 'OV', 'OW', 'UN')
+
+
+def to_json_value(value):
+    """ Converts a DICOM element value to a JSON-serializable value """
+    if value is None:
+        return None
+    if isinstance(value, (list, pydicom.multival.MultiValue)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    return str(value)
+
+
+def read_header_values(f):
+    """ Returns {tag: JSON value} for the non-binary top-level elements of DICOM file f """
+    p = pydicom.dcmread(f, stop_before_pixels=True)
+    values = {}
+    for element in p:
+        if element.VR in SKIPPED_VRS:
+            continue
+        values[int(element.tag)] = json.dumps(to_json_value(element.value))
+    return values
+
+
+def _read_header_values(f):
+    try:
+        return f, os.stat(f), read_header_values(f), None
+    except Exception as e:
+        return f, None, None, str(e)
+
+
+def _matches(stored, value):
+    if stored == value:
+        return True
+    if not isinstance(value, str) or stored is None:
+        return False
+    if isinstance(stored, list):
+        return '\\'.join([str(v) for v in stored]) == value
+    if isinstance(stored, (int, float)):
+        try:
+            return float(value) == stored
+        except ValueError:
+            return False
+    return False
+
+
+class DicomHeaderIndex(object):
+    """ Persistent index of DICOM header values in an SQLite database. Entries are keyed by
+    file path and remember the file's modification time and size, so calling update() again
+    only re-reads headers of new or changed files. Tag values are stored as JSON and looked up
+    without touching the DICOM files.
+    """
+
+    def __init__(self, db_file=':memory:'):
+        self._db_file = db_file
+        self._connection = sqlite3.connect(db_file)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+            CREATE TABLE IF NOT EXISTS tag_values (path TEXT, tag INTEGER, value TEXT, PRIMARY KEY (tag, path));
+            CREATE INDEX IF NOT EXISTS tag_values_path ON tag_values (path);
+        """)
+
+    def get_db_file(self):
+        return self._db_file
+
+    def close(self):
+        self._connection.close()
+
+    def update(self, files, nr_workers=16, verbose=False):
+        """ Brings the index up-to-date for the given DICOM files. Files that changed since they
+        were indexed are re-read in a thread pool and indexed files that no longer exist on disk
+        are removed. Returns the number of headers read.
+        """
+        indexed = dict([(path, (mtime_ns, size)) for path, mtime_ns, size in
+                        self._connection.execute('SELECT path, mtime_ns, size FROM files')])
+        changed = []
+        for f in files:
+            try:
+                stat = os.stat(f)
+            except OSError:
+                continue
+            if indexed.get(f) != (stat.st_mtime_ns, stat.st_size):
+                changed.append(f)
+        removed = [f for f in indexed.keys() if not os.path.exists(f)]
+        nr_read = 0
+        with ThreadPoolExecutor(max_workers=nr_workers) as executor, self._connection:
+            for f in removed:
+                self._delete(f)
+            for f, stat, values, error in executor.map(_read_header_values, changed):
+                # Also when the file cannot be read anymore, so no stale values remain
+                self._delete(f)
+                if error is not None:
+                    if verbose:
+                        print('Error: could not read header of {}: {}'.format(f, error))
+                    continue
+                self._connection.execute('INSERT INTO files VALUES (?, ?, ?)', (f, stat.st_mtime_ns, stat.st_size))
+                self._connection.executemany(
+                    'INSERT INTO tag_values VALUES (?, ?, ?)', [(f, tag, value) for tag, value in values.items()])
+                nr_read += 1
+        if verbose:
+            print('Read {} headers, removed {} files, index contains {} files'.format(
+                nr_read, len(removed), len(self.get_files())))
+        return nr_read
+
+    def _delete(self, f):
+        self._connection.execute('DELETE FROM files WHERE path = ?', (f,))
+        self._connection.execute('DELETE FROM tag_values WHERE path = ?', (f,))
+
+    def get_files(self):
+        return [row[0] for row in self._connection.execute('SELECT path FROM files ORDER BY path')]
+
+    def get_tag_values(self, tag, files=None):
+        """ Returns {file: value} for all indexed files (or only the given files) that have tag """
+        rows = self._connection.execute(
+            'SELECT path, value FROM tag_values WHERE tag = ?', (int(pydicom.tag.Tag(tag)),))
+        if files is None:
+            return dict([(path, json.loads(value)) for path, value in rows])
+        files = set(files)
+        return dict([(path, json.loads(value)) for path, value in rows if path in files])
+
+    def find_files(self, tag, value, files=None):
+        """ Returns the indexed files (or those among the given files) where tag has value.
+        String values, e.g. typed in the shell, also match numbers and multi-values written
+        the DICOM way (1.0\\2.0)
+        """
+        return sorted([f for f, v in self.get_tag_values(tag, files).items() if _matches(v, value)])
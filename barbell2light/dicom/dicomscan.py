@@ -0,0 +1,162 @@
+import os
+import time
+import fnmatch
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+DICOM_MAGIC = b'DICM'
+DICOM_MAGIC_OFFSET = 128
+
+
+def has_dicom_magic(file_path):
+    """ Checks the 4-byte DICM marker at offset 128 using a raw file descriptor, which is
+    always closed again.
+    """
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.lseek(fd, DICOM_MAGIC_OFFSET, os.SEEK_SET)
+        return os.read(fd, len(DICOM_MAGIC)) == DICOM_MAGIC
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def _scan_dir(d):
+    dirs, files = [], []
+    try:
+        entries = os.scandir(d)
+    except OSError:
+        return dirs, files
+    with entries:
+        for entry in entries:
+            if entry.name.startswith('._'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry.path)
+            except OSError:
+                continue
+    return dirs, files
+
+
+def scan_files(d):
+    """ Yields the paths of all regular files in directory tree d using os.scandir. Hidden
+    macOS resource files (._*) are skipped.
+    """
+    dirs = [d]
+    while len(dirs) > 0:
+        sub_dirs, files = _scan_dir(dirs.pop())
+        dirs.extend(sub_dirs)
+        yield from files
+
+
+def scan_files_parallel(d, nr_workers=8):
+    """ Like scan_files(), but lists subdirectories concurrently in a thread pool, which
+    helps on network storage. Files are yielded per directory in order of completion.
+    """
+    with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+        pending = {executor.submit(_scan_dir, d)}
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sub_dirs, files = future.result()
+                pending.update([executor.submit(_scan_dir, sub_dir) for sub_dir in sub_dirs])
+                yield from files
+
+
+def match_patterns(f, include=None, exclude=None):
+    """ Returns True if path f matches any of the include patterns (if given) and none of the
+    exclude patterns. Patterns are shell-style, e.g. '*.dcm' or '*/localizer/*'
+    """
+    if include and not any([fnmatch.fnmatch(f, pattern) for pattern in include]):
+        return False
+    if exclude and any([fnmatch.fnmatch(f, pattern) for pattern in exclude]):
+        return False
+    return True
+
+
+class DicomScanProgress(object):
+    """ Counts files found, checked and recognized as DICOM by iter_dicom_files(). The ETA
+    covers the files found so far, since the size of the tree is unknown while scanning.
+    """
+
+    def __init__(self):
+        self.nr_found = 0
+        self.nr_checked = 0
+        self.nr_dicom = 0
+        self.start_time = time.perf_counter()
+
+    def get_elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def get_files_per_sec(self):
+        elapsed = self.get_elapsed()
+        return self.nr_checked / elapsed if elapsed > 0 else 0.0
+
+    def get_eta(self):
+        files_per_sec = self.get_files_per_sec()
+        if files_per_sec == 0:
+            return None
+        return (self.nr_found - self.nr_checked) / files_per_sec
+
+    def __str__(self):
+        eta = self.get_eta()
+        return 'Checked {} of {} files found, {} DICOM, {:.1f} files/s, ETA {}'.format(
+            self.nr_checked, self.nr_found, self.nr_dicom, self.get_files_per_sec(),
+            '?' if eta is None else '{:.1f} s'.format(eta))
+
+
+def _check_files(file_paths):
+    return [(f, has_dicom_magic(f)) for f in file_paths]
+
+
+def iter_dicom_files(d, nr_workers=16, batch_size=256, include_non_dicom=False, include=None, exclude=None,
+                     nr_scan_workers=1, progress=None):
+    """ Yields the DICOM files in directory tree d as they are found. Files are checked in
+    batches by a thread pool with a bounded number of batches in flight, so memory use does
+    not depend on the size of the tree. If include_non_dicom is True, (path, is_dicom) tuples
+    are yielded for all files instead. Only files matching the include/exclude patterns are
+    checked (see match_patterns()). With nr_scan_workers > 1 directories are listed
+    concurrently. A DicomScanProgress passed as progress is updated along the way.
+    """
+    max_pending = 2 * nr_workers
+    pending = deque()
+    batch = []
+    files = scan_files(d) if nr_scan_workers <= 1 else scan_files_parallel(d, nr_scan_workers)
+    with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+        for f in files:
+            if (include or exclude) and not match_patterns(f, include, exclude):
+                continue
+            if progress is not None:
+                progress.nr_found += 1
+            batch.append(f)
+            if len(batch) < batch_size:
+                continue
+            pending.append(executor.submit(_check_files, batch))
+            batch = []
+            while len(pending) >= max_pending:
+                yield from _get_results(pending.popleft(), include_non_dicom, progress)
+        if len(batch) > 0:
+            pending.append(executor.submit(_check_files, batch))
+        while len(pending) > 0:
+            yield from _get_results(pending.popleft(), include_non_dicom, progress)
+
+
+def _get_results(future, include_non_dicom, progress=None):
+    results = future.result()
+    if progress is not None:
+        progress.nr_checked += len(results)
+        progress.nr_dicom += len([f for f, is_dicom in results if is_dicom])
+    for f, is_dicom in results:
+        if include_non_dicom:
+            yield f, is_dicom
+        elif is_dicom:
+            yield f
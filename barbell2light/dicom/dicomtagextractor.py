@@ -0,0 +1,101 @@
+import os
+import pydicom
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from barbell2light.dicom import get_dicom_tag_for_name
+from barbell2light.dicom.dicomheaderindex import to_json_value
+
+
+def extract_tag_values(f, tags):
+    """ Returns the values of tags (list of tags or keywords) in DICOM file f as a list, with
+    None for tags that are missing. Only the requested header elements are parsed.
+    """
+    p = pydicom.dcmread(f, stop_before_pixels=True, specific_tags=tags)
+    values = []
+    for tag in tags:
+        element = p.get(tag)
+        values.append(None if element is None else element.value)
+    return values
+
+
+def save_data_frame(data_frame, file_path):
+    """ Writes data_frame as Parquet if file_path ends with .parquet (requires pyarrow or
+    fastparquet), otherwise as CSV
+    """
+    if file_path.endswith('.parquet'):
+        data_frame.to_parquet(file_path, index=False)
+    else:
+        data_frame.to_csv(file_path, index=False)
+    return file_path
+
+
+def _extract_tag_values(args):
+    f, tags = args
+    try:
+        return f, [to_json_value(value) for value in extract_tag_values(f, tags)], None
+    except Exception as e:
+        return f, None, str(e)
+
+
+class DicomTagExtractor(object):
+    """ Extracts many tags at once from many DICOM files into a pandas DataFrame with one row
+    per file and one column per tag. Only the requested header elements are read, across a
+    process pool. Values are converted to plain Python types (str, int, float, list).
+    """
+
+    def __init__(self):
+        self._input_files = []
+        self._tag_names = []
+        self._tags = []
+        self._nr_workers = os.cpu_count()
+        self._chunk_size = 64
+        self._verbose = False
+        self._output_data_frame = None
+        self._errors = None
+
+    def set_input_files(self, files):
+        self._input_files = list(files)
+
+    def set_tag_names(self, tag_names):
+        tags = []
+        for tag_name in tag_names:
+            tag = get_dicom_tag_for_name(tag_name)
+            if tag is None:
+                raise RuntimeError('Unknown DICOM tag name {}'.format(tag_name))
+            tags.append(pydicom.tag.Tag(tag))
+        self._tag_names = list(tag_names)
+        self._tags = tags
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_output_data_frame(self):
+        return self._output_data_frame
+
+    def get_errors(self):
+        return self._errors
+
+    def execute(self):
+        self._errors = {}
+        rows = []
+        args = [(f, self._tags) for f in self._input_files]
+        with ProcessPoolExecutor(max_workers=self._nr_workers) as executor:
+            for f, values, error in executor.map(_extract_tag_values, args, chunksize=self._chunk_size):
+                if error is not None:
+                    self._errors[f] = error
+                    if self._verbose:
+                        print('Error: could not read header of {}: {}'.format(f, error))
+                    continue
+                rows.append([f] + values)
+        self._output_data_frame = pd.DataFrame(rows, columns=['file'] + self._tag_names)
+        return self._output_data_frame
+
+    def save(self, file_path):
+        if self._output_data_frame is None:
+            raise RuntimeError('Nothing extracted yet, call execute() first')
+        return save_data_frame(self._output_data_frame, file_path)
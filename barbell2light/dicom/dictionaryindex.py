@@ -0,0 +1,80 @@
+import threading
+
+from functools import lru_cache
+
+from pydicom._dicom_dict import DicomDictionary
+
+
+class DicomDictionaryIndex(object):
+    """ Lookup tables for pydicom's DICOM dictionary, built once on first use. Maps keywords
+    and names to tags in O(1) and keeps a token index of all dictionary fields, so keyword
+    searches only check entries that contain a matching token.
+    """
+
+    def __init__(self, dictionary=None):
+        self._dictionary = DicomDictionary if dictionary is None else dictionary
+        self._lock = threading.Lock()
+        self._built = False
+        self._keywords = None
+        self._names = None
+        self._entries = None
+        self._tokens = None
+
+    def _build(self):
+        with self._lock:
+            if self._built:
+                return
+            keywords, names, entries, tokens = {}, {}, [], {}
+            for key, value in self._dictionary.items():
+                # The first entry wins, like a linear scan of the dictionary would
+                keywords.setdefault(value[4], key)
+                names.setdefault(value[2], key)
+                entries.append(('{}: {}'.format(key, value), value))
+                for token in set(' '.join(value).split()):
+                    tokens.setdefault(token, []).append(len(entries) - 1)
+            self._keywords, self._names, self._entries, self._tokens = keywords, names, entries, tokens
+            self._built = True
+
+    def get_tag_for_keyword(self, keyword):
+        if not self._built:
+            self._build()
+        return self._keywords.get(keyword)
+
+    def get_tag_for_name(self, name):
+        if not self._built:
+            self._build()
+        return self._names.get(name)
+
+    def find(self, key_word=''):
+        """ Returns '<tag>: <entry>' for each dictionary entry once for every field containing
+        key_word, in dictionary order, or all entries if key_word is empty
+        """
+        return list(self._find(key_word))
+
+    @lru_cache(maxsize=256)
+    def _find(self, key_word):
+        if not self._built:
+            self._build()
+        if key_word == '':
+            return tuple([output for output, _ in self._entries])
+        if any(c.isspace() for c in key_word):
+            candidates = range(len(self._entries))
+        else:
+            # A key word without whitespace can only be found inside a single token
+            candidates = set()
+            for token, indexes in self._tokens.items():
+                if key_word in token:
+                    candidates.update(indexes)
+            candidates = sorted(candidates)
+        outputs = []
+        for i in candidates:
+            output, value = self._entries[i]
+            outputs.extend([output for item in value if key_word in item])
+        return tuple(outputs)
+
+
+_dictionary_index = DicomDictionaryIndex()
+
+
+def get_dictionary_index():
+    return _dictionary_index
@@ -0,0 +1,78 @@
+import os
+import pydicom
+import numpy as np
+
+from functools import lru_cache
+
+
+GEOMETRY_TAGS = [
+    'Rows',
+    'Columns',
+    'PixelSpacing',
+    'SliceThickness',
+    'ImagePositionPatient',
+    'ImageOrientationPatient',
+    'SeriesInstanceUID',
+    'InstanceNumber',
+]
+
+
+class DicomGeometry(object):
+    """ Image geometry of a single DICOM file, read from its header only """
+
+    def __init__(self, p):
+        self.rows = int(p.Rows)
+        self.columns = int(p.Columns)
+        self.pixel_spacing = self._get_floats(p, 'PixelSpacing', (1.0, 1.0))
+        self.slice_thickness = float(p.get('SliceThickness') or 1.0)
+        self.image_position = self._get_floats(p, 'ImagePositionPatient', (0.0, 0.0, 0.0))
+        self.image_orientation = self._get_floats(p, 'ImageOrientationPatient', (1.0, 0.0, 0.0, 0.0, 1.0, 0.0))
+        self.has_image_position = 'ImagePositionPatient' in p
+        self.series_instance_uid = p.get('SeriesInstanceUID')
+        self.instance_number = int(p.InstanceNumber) if p.get('InstanceNumber') is not None else None
+
+    @staticmethod
+    def _get_floats(p, keyword, default):
+        value = p.get(keyword)
+        if value is None:
+            return default
+        return tuple(float(x) for x in value)
+
+    def get_shape(self):
+        return self.rows, self.columns
+
+    def get_spacing(self):
+        return self.pixel_spacing[0], self.pixel_spacing[1], self.slice_thickness
+
+    def get_origin(self):
+        return self.image_position
+
+    def get_slice_normal(self):
+        row, column = np.array(self.image_orientation[:3]), np.array(self.image_orientation[3:])
+        return np.cross(row, column)
+
+    def get_slice_location(self):
+        """ Returns the position of the slice along its normal """
+        return float(np.dot(self.get_slice_normal(), self.image_position))
+
+    def get_direction(self):
+        """ Returns the 3x3 direction cosines matrix (flattened) as used by SimpleITK """
+        return (*self.image_orientation, 0.0, 0.0, 1.0)
+
+
+@lru_cache(maxsize=8192)
+def _load_dicom_geometry(f, mtime, size):
+    p = pydicom.dcmread(f, stop_before_pixels=True, specific_tags=GEOMETRY_TAGS)
+    return DicomGeometry(p)
+
+
+def get_dicom_geometry(f):
+    """ Returns the DicomGeometry of DICOM file f. Only the geometry tags are parsed and
+    results are cached per file path, modification time and size.
+    """
+    stat = os.stat(f)
+    return _load_dicom_geometry(os.path.abspath(f), stat.st_mtime_ns, stat.st_size)
+
+
+def clear_dicom_geometry_cache():
+    _load_dicom_geometry.cache_clear()
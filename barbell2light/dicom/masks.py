@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def get_label_masks(pixels, labels):
+    """ Returns a (nr. labels, *pixels.shape) uint8 array holding a binary mask for each
+    label, computed in a single broadcast comparison.
+    """
+    labels = np.asarray(labels, dtype=pixels.dtype).reshape((-1,) + (1,) * pixels.ndim)
+    return (pixels[np.newaxis] == labels).view(np.uint8)
+
+
+def pack_label_masks(masks):
+    """ Packs up to 8 binary masks into one uint8 array where bit i holds mask i """
+    if masks.shape[0] > 8:
+        raise RuntimeError('Cannot bit-pack more than 8 masks')
+    packed = np.zeros(masks.shape[1:], dtype=np.uint8)
+    for i in range(masks.shape[0]):
+        packed |= masks[i] << np.uint8(i)
+    return packed
+
+
+def save_packed_masks(file_path, masks, label_names):
+    """ Saves binary masks with 1 bit per pixel (np.packbits) in a compressed .npz file """
+    np.savez_compressed(
+        file_path, masks=np.packbits(masks, axis=None), shape=np.array(masks.shape), labels=np.array(label_names))
+
+
+def load_packed_masks(file_path):
+    """ Returns a dictionary of label name to binary mask from a file written by save_packed_masks() """
+    data = np.load(file_path)
+    shape = tuple(data['shape'])
+    masks = np.unpackbits(data['masks'], count=int(np.prod(shape))).reshape(shape)
+    return {str(name): masks[i] for i, name in enumerate(data['labels'])}
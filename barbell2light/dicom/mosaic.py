@@ -0,0 +1,162 @@
+import os
+import json
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from barbell2light.dicom import iter_dicom_tag_pairs
+from barbell2light.dicom.pixelcache import disable_pixel_cache
+from barbell2light.dicom.pngwriter import write_png, get_thumbnail
+from barbell2light.dicom.tag2dcm import Tag2Dcm
+from barbell2light.dicom.windowing import window_dicom_pixels
+
+
+def render_tile(dcm_file, tag_file, tile_size=256):
+    """ Renders the windowed CT slice and its TAG overlay of a DICOM+TAG pair as two RGB
+    thumbnails of at most tile_size x tile_size pixels, using the same window and color map
+    as Tag2Dcm.
+    """
+    pixels = window_dicom_pixels(dcm_file)[0]
+    pixels_tag = Tag2Dcm.get_tag_pixels(dcm_file, tag_file)
+    if pixels_tag is None or pixels_tag.shape != pixels.shape:
+        raise RuntimeError('TAG file {} does not match shape of DICOM file {}'.format(tag_file, dcm_file))
+    # Downscale before going to RGB, so the gray thumbnail is only expanded at tile size
+    pixels = get_thumbnail(pixels, tile_size)
+    pixels_new = get_thumbnail(Tag2Dcm.get_overlay_pixels(pixels_tag), tile_size)
+    return np.repeat(pixels[:, :, np.newaxis], 3, axis=2), pixels_new
+
+
+def _render_tile(args):
+    dcm_file, tag_file, tile_size = args
+    try:
+        return render_tile(dcm_file, tag_file, tile_size), None
+    except Exception as e:
+        return None, str(e)
+
+
+class MosaicRenderer(object):
+    """ Renders many DICOM+TAG pairs into a few large PNG contact sheets for segmentation QC.
+    Each tile shows the windowed CT slice with its TAG overlay next to it. Tiles are decoded
+    in a process pool and copied into one preallocated canvas per mosaic. The file index.json
+    in the output directory maps each mosaic tile back to its DICOM and TAG file.
+    """
+
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self):
+        self._input_files = []
+        self._output_dir = '.'
+        self._tile_size = 256
+        self._nr_rows = 8
+        self._nr_columns = 8
+        self._nr_workers = os.cpu_count()
+        self._verbose = False
+        self._output_files = None
+        self._errors = None
+
+    def set_input_files(self, dcm_and_tag_files):
+        self._input_files = list(dcm_and_tag_files)
+
+    def set_input_dir(self, d):
+        # Sorted, so tiles of neighbouring slices end up next to each other
+        self._input_files = sorted(iter_dicom_tag_pairs(d))
+
+    def set_output_dir(self, output_dir):
+        self._output_dir = output_dir
+
+    def set_tile_size(self, tile_size):
+        self._tile_size = tile_size
+
+    def set_grid_size(self, nr_rows, nr_columns):
+        self._nr_rows = nr_rows
+        self._nr_columns = nr_columns
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_output_files(self):
+        return self._output_files
+
+    def get_output_index_file_path(self):
+        return os.path.join(self._output_dir, self.INDEX_FILE_NAME)
+
+    def get_errors(self):
+        return self._errors
+
+    def _create_canvas(self):
+        # Each tile is tile_size high and two tiles (CT and overlay) wide
+        return np.zeros((self._nr_rows * self._tile_size, self._nr_columns * 2 * self._tile_size, 3), dtype=np.uint8)
+
+    def _write_mosaic(self, canvas, nr):
+        output_file = os.path.join(self._output_dir, 'mosaic_{:05d}.png'.format(nr))
+        write_png(output_file, canvas)
+        if self._verbose:
+            print('Written {}'.format(output_file))
+        return output_file
+
+    def execute(self):
+        os.makedirs(self._output_dir, exist_ok=True)
+        self._output_files = []
+        self._errors = {}
+        index = []
+        nr_tiles = self._nr_rows * self._nr_columns
+        tile_size = self._tile_size
+        canvas = self._create_canvas()
+        tile_nr = 0
+        args = [(dcm_file, tag_file, tile_size) for dcm_file, tag_file in self._input_files]
+        with ProcessPoolExecutor(max_workers=self._nr_workers, initializer=disable_pixel_cache) as executor:
+            tiles = executor.map(_render_tile, args, chunksize=8)
+            for (dcm_file, tag_file), (tile, error) in zip(self._input_files, tiles):
+                if error is not None:
+                    self._errors[dcm_file] = error
+                    print('Error: {}: {}'.format(dcm_file, error))
+                    continue
+                row, column = divmod(tile_nr % nr_tiles, self._nr_columns)
+                y, x = row * tile_size, column * 2 * tile_size
+                pixels, pixels_new = tile
+                canvas[y:y + pixels.shape[0], x:x + pixels.shape[1]] = pixels
+                canvas[y:y + pixels_new.shape[0], x + tile_size:x + tile_size + pixels_new.shape[1]] = pixels_new
+                index.append({
+                    'mosaic': 'mosaic_{:05d}.png'.format(len(self._output_files)),
+                    'row': row,
+                    'column': column,
+                    'dcm_file': dcm_file,
+                    'tag_file': tag_file,
+                })
+                tile_nr += 1
+                if tile_nr % nr_tiles == 0:
+                    self._output_files.append(self._write_mosaic(canvas, len(self._output_files)))
+                    canvas.fill(0)
+        if tile_nr % nr_tiles != 0:
+            self._output_files.append(self._write_mosaic(canvas, len(self._output_files)))
+        with open(self.get_output_index_file_path(), 'w') as f:
+            json.dump(index, f, indent=4)
+        return self._output_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Renders DICOM+TAG pairs into PNG mosaics for segmentation QC')
+    parser.add_argument('input_dir', help='Directory containing DICOM files with .tag files next to them')
+    parser.add_argument('output_dir', help='Directory to write mosaics and index.json to')
+    parser.add_argument('--tile_size', type=int, default=256, help='Size in pixels of each CT and overlay tile')
+    parser.add_argument('--nr_rows', type=int, default=8, help='Number of tile rows per mosaic')
+    parser.add_argument('--nr_columns', type=int, default=8, help='Number of tile columns per mosaic')
+    parser.add_argument('--nr_workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    renderer = MosaicRenderer()
+    renderer.set_input_dir(args.input_dir)
+    renderer.set_output_dir(args.output_dir)
+    renderer.set_tile_size(args.tile_size)
+    renderer.set_grid_size(args.nr_rows, args.nr_columns)
+    renderer.set_nr_workers(args.nr_workers)
+    renderer.set_verbose(args.verbose)
+    renderer.execute()
+
+
+if __name__ == '__main__':
+    main()
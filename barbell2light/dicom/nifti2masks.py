@@ -3,6 +3,11 @@ import json
 import numpy as np
 import SimpleITK as sitk
 
+from concurrent.futures import ThreadPoolExecutor
+
+from .masks import get_label_masks, pack_label_masks
+from .niftiwriter import NiftiWriter
+
 
 class Nifti2Masks(object):
 
@@ -12,6 +17,10 @@ class Nifti2Masks(object):
         self._output_dir = None
         self._output_file_paths = None
         self._overwrite_output = False
+        self._output_mode = 'separate'
+        self._output_channels = None
+        self._nr_workers = None
+        self._nifti_writer = NiftiWriter()
 
     def set_input_nifti_file_path(self, file_path):
         self._input_nifti_file_path = file_path
@@ -28,9 +37,27 @@ class Nifti2Masks(object):
     def set_overwrite_output(self, value):
         self._overwrite_output = value
 
+    def set_output_mode(self, output_mode):
+        """ Sets how masks are written: 'separate' (one file per label), 'multichannel' (one
+        vector image with a channel per label) or 'bitpacked' (one uint8 image, bit i is label i)
+        """
+        if output_mode not in ('separate', 'multichannel', 'bitpacked'):
+            raise RuntimeError('Unknown output mode {}'.format(output_mode))
+        self._output_mode = output_mode
+
+    def set_output_format(self, output_format, compression_level=None, nr_threads=1):
+        """ Sets output format 'nii' or 'nii.gz', see NiftiWriter """
+        self._nifti_writer.set_output_format(output_format, compression_level, nr_threads)
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
     def get_output_file_paths(self):
         return self._output_file_paths
 
+    def get_output_channels(self):
+        return self._output_channels
+
     @staticmethod
     def _threshold_image(image, label):
         image = sitk.BinaryThreshold(image, float(label), float(label))
@@ -55,30 +82,48 @@ class Nifti2Masks(object):
             x = x[0]
         return x
 
+    def _get_output_file_path(self, file_base_name, suffix):
+        file_name = '{}_{}{}'.format(file_base_name, suffix, self._nifti_writer.get_extension())
+        return os.path.join(self._output_dir, file_name)
+
+    def _write_image(self, pixels, reference_image, file_path, is_vector=False):
+        image = sitk.GetImageFromArray(pixels, isVector=is_vector)
+        image.CopyInformation(reference_image)
+        return self._nifti_writer.execute(image, file_path)
+
     def execute(self):
         file_base_name = self._get_file_base_name(self._input_nifti_file_path)
         label_map = self._get_int16_label_map(self._label_map)
-        file_paths = {}
-        for label in label_map.keys():
-            reader = sitk.ImageFileReader()
-            reader.SetImageIO('NiftiImageIO')
-            reader.SetFileName(self._input_nifti_file_path)
-            image = reader.Execute()
-            image_new = self._threshold_image(image, label)
-            writer = sitk.ImageFileWriter()
-            file_path = os.path.join(self._output_dir, '{}_{}.nii.gz'.format(file_base_name, label_map[label]))
-            try:
-                os.stat(file_path)
-                if not self._overwrite_output:
-                    print('Error: file {} already exists!'.format(file_path))
-                    return
-            except FileNotFoundError:
-                pass
-            writer.SetFileName(file_path)
-            file_paths[label_map[label]] = file_path
-            writer.SetImageIO('NiftiImageIO')
-            writer.Execute(image_new)
+        labels = list(label_map.keys())
+        if self._output_mode == 'separate':
+            file_paths = dict([
+                (label_map[label], self._get_output_file_path(file_base_name, label_map[label])) for label in labels])
+        else:
+            # All label names point to the same file, the channel or bit index follows the label map order
+            suffix = 'masks' if self._output_mode == 'multichannel' else 'masks_packed'
+            file_path = self._get_output_file_path(file_base_name, suffix)
+            file_paths = {label_map[label]: file_path for label in labels}
+        for file_path in set(file_paths.values()):
+            if os.path.isfile(file_path) and not self._overwrite_output:
+                print('Error: file {} already exists!'.format(file_path))
+                return
+        reader = sitk.ImageFileReader()
+        reader.SetImageIO('NiftiImageIO')
+        reader.SetFileName(self._input_nifti_file_path)
+        image = reader.Execute()
+        masks = get_label_masks(sitk.GetArrayViewFromImage(image), labels)
+        if self._output_mode == 'separate':
+            with ThreadPoolExecutor(max_workers=self._nr_workers) as executor:
+                list(executor.map(
+                    lambda i: self._write_image(masks[i], image, file_paths[label_map[labels[i]]]), range(len(labels))))
+        elif self._output_mode == 'multichannel':
+            self._write_image(np.moveaxis(masks, 0, -1), image, file_path, is_vector=True)
+        elif self._output_mode == 'bitpacked':
+            self._write_image(pack_label_masks(masks), image, file_path)
+        else:
+            raise RuntimeError('Unknown output mode {}'.format(self._output_mode))
         self._output_file_paths = file_paths
+        self._output_channels = [label_map[label] for label in labels]
         print(self._output_file_paths)
 
 
@@ -0,0 +1,107 @@
+import io
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from barbell2light.dicom.dcm2nifti import Dcm2Nifti
+from barbell2light.dicom.tag2nifti import Tag2Nifti
+from barbell2light.dicom.nifti2masks import Nifti2Masks
+
+
+# (name, output format, compression level, nr. threads)
+BENCHMARK_OPTIONS = [
+    ('nii', 'nii', None, 1),
+    ('nii.gz level 1', 'nii.gz', 1, 1),
+    ('nii.gz default', 'nii.gz', None, 1),
+    ('nii.gz level 9', 'nii.gz', 9, 1),
+    ('nii.gz parallel', 'nii.gz', None, os.cpu_count()),
+]
+
+
+def _create_dcm2nifti(data_dir, output_dir):
+    node = Dcm2Nifti()
+    node.set_input_dicom_file_path(os.path.join(data_dir, '10_raw.dcm'))
+    node.set_output_dir(output_dir)
+    return node
+
+
+def _create_tag2nifti(data_dir, output_dir):
+    node = Tag2Nifti()
+    node.set_input_dicom_file_path(os.path.join(data_dir, '10.dcm'))
+    node.set_input_tag_file_path(os.path.join(data_dir, '10.tag'))
+    node.set_output_dir(output_dir)
+    return node
+
+
+def _create_nifti2masks(data_dir, output_dir):
+    node = _create_tag2nifti(data_dir, output_dir)
+    node.set_overwrite_output(True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        node.execute()
+    masks_node = Nifti2Masks()
+    masks_node.set_input_nifti_file_path(node.get_output_file_path())
+    masks_node.set_label_map_tomovision()
+    masks_node.set_output_dir(output_dir)
+    return masks_node
+
+
+def _get_output_files(node):
+    if isinstance(node, Nifti2Masks):
+        return set(node.get_output_file_paths().values())
+    return {node.get_output_file_path()}
+
+
+def run_benchmark(data_dir, nr_repeats=20, verbose=True):
+    """ Runs Dcm2Nifti, Tag2Nifti and Nifti2Masks on the sample data for each output option
+    and returns a list of results. MB/s is measured against the size of the uncompressed
+    (.nii) output, so options can be compared directly.
+    """
+    results = []
+    nodes = [('Dcm2Nifti', _create_dcm2nifti), ('Tag2Nifti', _create_tag2nifti), ('Nifti2Masks', _create_nifti2masks)]
+    output_dir = tempfile.mkdtemp()
+    try:
+        for node_name, create_node in nodes:
+            raw_size = None
+            for option_name, output_format, compression_level, nr_threads in BENCHMARK_OPTIONS:
+                node = create_node(data_dir, output_dir)
+                node.set_output_format(output_format, compression_level, nr_threads)
+                node.set_overwrite_output(True)
+                # The nodes print every file they write, keep that out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    for _ in range(nr_repeats):
+                        node.execute()
+                    elapsed = time.perf_counter() - start
+                output_files = _get_output_files(node)
+                output_size = sum([os.path.getsize(f) for f in output_files])
+                if raw_size is None:
+                    raw_size = output_size
+                result = {
+                    'node': node_name,
+                    'option': option_name,
+                    'files_per_sec': len(output_files) * nr_repeats / elapsed,
+                    'mb_per_sec': raw_size * nr_repeats / elapsed / (1024 * 1024),
+                    'output_mb': output_size / (1024 * 1024),
+                }
+                results.append(result)
+                if verbose:
+                    print('{node:<12} {option:<16} {files_per_sec:>10.1f} files/s {mb_per_sec:>10.1f} MB/s '
+                          '{output_mb:>8.3f} MB/output'.format(**result))
+    finally:
+        shutil.rmtree(output_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks NIfTI output formats of the converter nodes')
+    parser.add_argument('--data_dir', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+    parser.add_argument('--nr_repeats', type=int, default=20)
+    args = parser.parse_args()
+    run_benchmark(args.data_dir, args.nr_repeats)
+
+
+if __name__ == '__main__':
+    main()
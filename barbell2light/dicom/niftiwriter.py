@@ -0,0 +1,65 @@
+import os
+import gzip
+import SimpleITK as sitk
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+NIFTI_OUTPUT_FORMATS = ('nii', 'nii.gz')
+PARALLEL_GZIP_CHUNK_SIZE = 1024 * 1024
+
+
+def gzip_parallel(data, compression_level=6, nr_threads=None, chunk_size=PARALLEL_GZIP_CHUNK_SIZE):
+    """ Compresses data as a sequence of independent gzip members, one per chunk, in a
+    thread pool (zlib releases the GIL). Concatenated members form a valid gzip stream.
+    """
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b'']
+    with ThreadPoolExecutor(max_workers=nr_threads) as executor:
+        return b''.join(executor.map(lambda chunk: gzip.compress(chunk, compression_level), chunks))
+
+
+class NiftiWriter(object):
+    """ Writes SimpleITK images as uncompressed .nii or gzipped .nii.gz files. For .nii.gz a
+    compression level can be chosen and with more than one thread the gzip compression runs in
+    parallel on chunks of the uncompressed file.
+    """
+
+    def __init__(self):
+        self._output_format = 'nii.gz'
+        self._compression_level = None
+        self._nr_threads = 1
+
+    def set_output_format(self, output_format, compression_level=None, nr_threads=1):
+        if output_format not in NIFTI_OUTPUT_FORMATS:
+            raise RuntimeError('Unknown NIfTI output format {}'.format(output_format))
+        self._output_format = output_format
+        self._compression_level = compression_level
+        self._nr_threads = nr_threads
+
+    def get_output_format(self):
+        return self._output_format
+
+    def get_extension(self):
+        return '.' + self._output_format
+
+    def execute(self, image, file_path):
+        writer = sitk.ImageFileWriter()
+        writer.SetImageIO('NiftiImageIO')
+        # NiftiImageIO ignores the compression level, so compress ourselves if a level or
+        # multiple threads are requested. The uncompressed file is written next to the target first
+        if self._output_format == 'nii.gz' and (self._compression_level is not None or self._nr_threads > 1):
+            file_path_raw = file_path[:-len('.nii.gz')] + '.tmp.nii'
+            writer.SetFileName(file_path_raw)
+            writer.SetUseCompression(False)
+            writer.Execute(image)
+            with open(file_path_raw, 'rb') as f:
+                data = f.read()
+            level = 6 if self._compression_level is None else self._compression_level
+            with open(file_path, 'wb') as f:
+                f.write(gzip_parallel(data, level, self._nr_threads))
+            os.remove(file_path_raw)
+            return file_path
+        writer.SetFileName(file_path)
+        writer.SetUseCompression(self._output_format == 'nii.gz')
+        writer.Execute(image)
+        return file_path
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .tagdecoder import write_tag_file, map_tag_pixels
+from .tagheader import TagHeader
+
+
+class NumPy2Tag(object):
+    """ Writes a label map to a TomoVision TAG file. The header is copied from a template
+    TAG file or TagHeader with its x, y and z fields set to the shape of the label map.
+    Without template a minimal header with only the dimensions is written. For an exact
+    round-trip read label maps with map_tag_pixels(), which keeps the first stored byte.
+    """
+
+    def __init__(self):
+        self._input_numpy_array = None
+        self._template_header = None
+        self._output_tag_file_path = None
+        self._overwrite_output = False
+
+    def set_input_numpy_array(self, numpy_array):
+        self._input_numpy_array = numpy_array
+
+    def set_template_header(self, header_or_tag_file_path):
+        if isinstance(header_or_tag_file_path, str):
+            header_or_tag_file_path = TagHeader.read(header_or_tag_file_path)
+        self._template_header = header_or_tag_file_path
+
+    def set_output_tag_file_path(self, file_path):
+        self._output_tag_file_path = file_path
+
+    def set_overwrite_output(self, value):
+        self._overwrite_output = value
+
+    def get_output_tag_file_path(self):
+        return self._output_tag_file_path
+
+    @staticmethod
+    def get_header_for_shape(template_header, shape):
+        if template_header is None:
+            return TagHeader.from_shape(shape)
+        header = TagHeader(template_header.get_text())
+        header.set('x', shape[-1])
+        header.set('y', shape[-2])
+        header.set('z', shape[0] if len(shape) > 2 else 1)
+        return header
+
+    def execute(self):
+        if self._input_numpy_array is None:
+            raise RuntimeError('Input NumPy array not set')
+        if self._output_tag_file_path is None:
+            raise RuntimeError('Output TAG file path not set')
+        pixels = np.asarray(self._input_numpy_array)
+        if pixels.ndim < 2:
+            raise RuntimeError('Label map must have at least 2 dimensions')
+        if os.path.isfile(self._output_tag_file_path) and not self._overwrite_output:
+            print('Error: file {} already exists!'.format(self._output_tag_file_path))
+            return
+        header = self.get_header_for_shape(self._template_header, pixels.shape)
+        write_tag_file(self._output_tag_file_path, pixels, header.get_text())
+
+    @staticmethod
+    def write_many(numpy_arrays, tag_file_paths, template_header=None, nr_workers=None):
+        """ Writes many label maps to TAG files concurrently. The template header is only
+        adapted once per distinct label map shape.
+        """
+        if isinstance(template_header, str):
+            template_header = TagHeader.read(template_header)
+        header_texts = {}
+
+        def write(pixels, tag_file_path):
+            pixels = np.asarray(pixels)
+            if pixels.shape not in header_texts:
+                header_texts[pixels.shape] = NumPy2Tag.get_header_for_shape(template_header, pixels.shape).get_text()
+            write_tag_file(tag_file_path, pixels, header_texts[pixels.shape])
+            return tag_file_path
+
+        with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+            return list(executor.map(write, numpy_arrays, tag_file_paths))
+
+
+if __name__ == '__main__':
+    node = NumPy2Tag()
+    node.set_input_numpy_array(np.array(map_tag_pixels('../../data/10.tag', (512, 512))))
+    node.set_template_header('../../data/10.tag')
+    node.set_output_tag_file_path('../../data/10_new.tag')
+    node.set_overwrite_output(True)
+    node.execute()
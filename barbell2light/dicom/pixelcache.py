@@ -0,0 +1,116 @@
+import os
+import threading
+import pydicom
+
+from collections import OrderedDict
+
+
+DEFAULT_PIXEL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PixelCache(object):
+    """ Size-bounded LRU cache of decoded pixel arrays. The memory budget is expressed in
+    bytes of array data. Cached arrays are read-only so callers cannot change them for
+    other users of the cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_PIXEL_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._nr_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def get_max_bytes(self):
+        return self._max_bytes
+
+    def get(self, key):
+        with self._lock:
+            pixels = self._items.get(key)
+            if pixels is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return pixels
+
+    def put(self, key, pixels):
+        pixels.setflags(write=False)
+        with self._lock:
+            if key in self._items:
+                self._nr_bytes -= self._items.pop(key).nbytes
+            if pixels.nbytes > self._max_bytes:
+                return pixels
+            self._items[key] = pixels
+            self._nr_bytes += pixels.nbytes
+            self._evict()
+        return pixels
+
+    def _evict(self):
+        while self._nr_bytes > self._max_bytes and len(self._items) > 0:
+            _, pixels = self._items.popitem(last=False)
+            self._nr_bytes -= pixels.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._nr_bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'items': len(self._items),
+                'nr_bytes': self._nr_bytes,
+                'max_bytes': self._max_bytes,
+            }
+
+
+_pixel_cache = PixelCache()
+
+
+def get_pixel_cache():
+    return _pixel_cache
+
+
+def disable_pixel_cache():
+    """ Turns the pixel cache of this process off. Used as initializer of batch worker
+    processes, which read each file once so caching would only hold on to memory
+    """
+    get_pixel_cache().set_max_bytes(0)
+
+
+def get_pixel_cache_key(f):
+    stat = os.stat(f)
+    return os.path.abspath(f), stat.st_mtime_ns, stat.st_size
+
+
+def read_dicom_pixels(f, normalize=False):
+    """ Returns the decoded pixels of DICOM file f through the process-wide pixel cache.
+    If normalize is True, pixels are rescaled to Hounsfield units using RescaleSlope and
+    RescaleIntercept. Raw and rescaled arrays are cached separately.
+    """
+    cache = get_pixel_cache()
+    key = get_pixel_cache_key(f)
+    pixels = cache.get(key + (bool(normalize),))
+    if pixels is not None:
+        return pixels
+    raw_key = key + (False,)
+    pixels = cache.get(raw_key) if normalize else None
+    if pixels is None:
+        p = pydicom.dcmread(f)
+        pixels = cache.put(raw_key, p.pixel_array)
+    else:
+        p = pydicom.dcmread(f, stop_before_pixels=True, specific_tags=['RescaleSlope', 'RescaleIntercept'])
+    if not normalize:
+        return pixels
+    return cache.put(key + (True,), pixels * p.get('RescaleSlope', 1) + p.get('RescaleIntercept', 0))
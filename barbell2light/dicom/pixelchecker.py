@@ -0,0 +1,104 @@
+import os
+import time
+import pydicom
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+def get_handler_name(handler):
+    """ Returns a short name for a pydicom pixel data handler module, e.g. gdcm or pylibjpeg.
+    The numpy handler, which reads uncompressed pixel data, is called native.
+    """
+    name = handler.__name__.split('.')[-1].replace('_handler', '')
+    return 'native' if name == 'numpy' else name
+
+
+def check_pixel_data(f):
+    """ Tries to decode the pixel data of DICOM file f with the same handlers, in the same
+    order, as pydicom's convert_pixel_data(). Returns the file, transfer syntax, handler that
+    succeeded, decode time in seconds and error message (None if decoding succeeded).
+    """
+    result = {'file': f, 'transfer_syntax': None, 'handler': None, 'seconds': None, 'error': None}
+    try:
+        p = pydicom.dcmread(f)
+        transfer_syntax = p.file_meta.TransferSyntaxUID
+        result['transfer_syntax'] = str(transfer_syntax)
+        handlers = [h for h in pydicom.config.pixel_data_handlers
+                    if h.is_available() and h.supports_transfer_syntax(transfer_syntax)]
+        if len(handlers) == 0:
+            raise NotImplementedError('No available pixel data handler for {}'.format(transfer_syntax.name))
+        errors = []
+        for handler in handlers:
+            start = time.perf_counter()
+            try:
+                handler.get_pixeldata(p)
+            except Exception as e:
+                errors.append('{}: {}'.format(get_handler_name(handler), e))
+                continue
+            result['seconds'] = time.perf_counter() - start
+            result['handler'] = get_handler_name(handler)
+            return result
+        raise RuntimeError('; '.join(errors))
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        return result
+
+
+class PixelChecker(object):
+    """ Checks whether the pixel data of many DICOM files can be decoded, across a process
+    pool. Besides the files that failed it reports the number of files, failures and decode
+    times grouped by transfer syntax and pixel data handler, which shows what is slow to
+    decode and what needs to be converted to RAW first.
+    """
+
+    def __init__(self):
+        self._input_files = []
+        self._nr_workers = os.cpu_count()
+        self._verbose = False
+        self._output_data_frame = None
+
+    def set_input_files(self, files):
+        self._input_files = list(files)
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_output_data_frame(self):
+        """ Returns one row per file with transfer syntax, handler, seconds and error """
+        return self._output_data_frame
+
+    def get_bad_files(self):
+        data_frame = self._output_data_frame
+        return list(data_frame[data_frame['error'].notna()]['file'])
+
+    def get_report(self):
+        """ Returns number of files and failures and total and mean decode time per transfer
+        syntax and handler. Failed files are grouped under handler 'failed'
+        """
+        data_frame = self._output_data_frame.copy()
+        data_frame['transfer_syntax'] = data_frame['transfer_syntax'].fillna('unknown')
+        data_frame['handler'] = data_frame['handler'].fillna('failed')
+        data_frame['failed'] = data_frame['error'].notna()
+        report = data_frame.groupby(['transfer_syntax', 'handler']).agg(
+            nr_files=('file', 'size'),
+            nr_failed=('failed', 'sum'),
+            total_seconds=('seconds', 'sum'),
+            mean_seconds=('seconds', 'mean'),
+        )
+        names = [pydicom.uid.UID(uid).name if uid != 'unknown' else uid for uid in report.index.get_level_values(0)]
+        report.insert(0, 'transfer_syntax_name', names)
+        return report
+
+    def execute(self):
+        rows = []
+        with ProcessPoolExecutor(max_workers=self._nr_workers) as executor:
+            for row in executor.map(check_pixel_data, self._input_files, chunksize=8):
+                if row['error'] is not None and self._verbose:
+                    print('ERROR: {}: {}'.format(row['file'], row['error']))
+                rows.append(row)
+        self._output_data_frame = pd.DataFrame(rows, columns=['file', 'transfer_syntax', 'handler', 'seconds', 'error'])
+        return self.get_bad_files()
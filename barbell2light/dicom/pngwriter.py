@@ -0,0 +1,61 @@
+import zlib
+import struct
+import numpy as np
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+
+def encode_png(pixels, compression_level=6):
+    """ Encodes a (rows, columns) grayscale or (rows, columns, 3) RGB uint8 array as PNG bytes
+    using only zlib, without any plotting or imaging library.
+    """
+    pixels = np.asarray(pixels)
+    if pixels.dtype != np.uint8:
+        raise RuntimeError('PNG pixels must be uint8, got {}'.format(pixels.dtype))
+    if pixels.ndim == 2:
+        color_type = 0
+    elif pixels.ndim == 3 and pixels.shape[2] == 3:
+        color_type = 2
+    else:
+        raise RuntimeError('PNG pixels must have shape (rows, columns) or (rows, columns, 3)')
+    rows, columns = pixels.shape[:2]
+    # Each scanline starts with filter type 0 (none)
+    scanlines = np.zeros((rows, 1 + pixels[0].size), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape((rows, -1))
+    header = struct.pack('>IIBBBBB', columns, rows, 8, color_type, 0, 0, 0)
+    return b''.join([
+        PNG_SIGNATURE,
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), compression_level)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def write_png(file_path, pixels, compression_level=6):
+    with open(file_path, 'wb') as f:
+        f.write(encode_png(pixels, compression_level))
+    return file_path
+
+
+def to_uint8(pixels):
+    """ Converts values in range [0, 1], e.g. the output of apply_ct_window(), to uint8 """
+    return np.rint(np.clip(pixels, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+
+def get_thumbnail(pixels, max_size):
+    """ Downscales pixels by an integer factor so that both dimensions are at most max_size,
+    averaging each block of factor x factor pixels
+    """
+    rows, columns = pixels.shape[:2]
+    factor = int(np.ceil(max(rows, columns) / float(max_size)))
+    if factor <= 1:
+        return pixels
+    rows, columns = rows // factor * factor, columns // factor * factor
+    blocks = pixels[:rows, :columns].reshape((rows // factor, factor, columns // factor, factor) + pixels.shape[2:])
+    return blocks.mean(axis=(1, 3)).round().astype(pixels.dtype)
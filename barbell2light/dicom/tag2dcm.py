@@ -2,10 +2,46 @@ import os
 import shutil
 import pydicom
 import numpy as np
-import matplotlib.pyplot as plt
 
-from barbell2light.dicom import is_dicom_file, is_tag_file, is_numpy_file, get_tag_file_for_dicom, \
-    get_numpy_file_for_dicom, tag2numpy, decompress
+from functools import lru_cache
+
+from barbell2light.dicom import is_dicom_file, is_tag_file, is_numpy_file, get_tag_file_for_dicom, tag2numpy
+from barbell2light.dicom.geometry import get_dicom_geometry
+from barbell2light.dicom.pixelcache import read_dicom_pixels
+from barbell2light.dicom.pngwriter import write_png, get_thumbnail
+from barbell2light.dicom.tagheader import TagHeader
+from barbell2light.dicom.windowing import DEFAULT_CT_WINDOW, apply_ct_window, window_pixels, get_rescale
+
+
+# Pixel module attributes (tag, VR, value) of the RGB overlays. New elements are created for
+# each output dataset, so changing one output does not affect the others
+OVERLAY_PIXEL_MODULE = (
+    (0x00280002, 'US', 3),  # SamplesPerPixel
+    (0x00280004, 'CS', 'RGB'),  # PhotometricInterpretation
+    (0x00280006, 'US', 0),  # PlanarConfiguration
+    (0x00280100, 'US', 8),  # BitsAllocated
+    (0x00280101, 'US', 8),  # BitsStored
+    (0x00280102, 'US', 7),  # HighBit
+)
+OVERLAY_OUTPUT_FORMATS = ('dcm', 'png')
+
+
+@lru_cache(maxsize=1)
+def _get_color_lut():
+    lut = np.array(Tag2Dcm.get_color_map(), dtype=np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+@lru_cache(maxsize=16)
+def _get_blend_lut(alpha):
+    gray = np.repeat(np.arange(256, dtype=float)[:, np.newaxis], 3, axis=1)
+    colors = _get_color_lut().astype(float)
+    blended = np.rint((1.0 - alpha) * gray[np.newaxis, :, :] + alpha * colors[:, np.newaxis, :])
+    lut = np.where(_get_color_lut().any(axis=1)[:, np.newaxis, np.newaxis], blended, gray[np.newaxis, :, :])
+    lut = lut.astype(np.uint8).reshape((256 * 256, 3))
+    lut.setflags(write=False)
+    return lut
 
 
 class Tag2Dcm:
@@ -26,6 +62,11 @@ class Tag2Dcm:
         self.copy_original_numpy_file_to_output_dir = False
         self.png_figure_size = (10, 10)
         self.create_pngs = False
+        self.fast_png_enabled = False
+        self.thumbnail_size = None
+        self.overlay_alpha = None
+        self.overlay_output_format = 'dcm'
+        self.output_blend_png_file = None
         self.verbose = False
 
     def set_dicom_and_tag_file(self, dcm_file, tag_file):
@@ -77,15 +118,34 @@ class Tag2Dcm:
     def set_create_pngs(self, create_pngs):
         self.create_pngs = create_pngs
 
+    def set_fast_png_enabled(self, enabled=True):
+        """ Writes PNGs directly from the pixel arrays instead of rendering matplotlib figures """
+        self.fast_png_enabled = enabled
+
+    def set_thumbnail_size(self, thumbnail_size):
+        """ Downscales PNGs written by the fast PNG path to at most thumbnail_size pixels """
+        self.thumbnail_size = thumbnail_size
+
+    def set_overlay_alpha(self, overlay_alpha):
+        """ Blends the label colors over the windowed CT with this alpha (0..1) instead of
+        replacing the CT pixels. None restores the label-only overlay
+        """
+        if overlay_alpha is not None and not 0.0 <= overlay_alpha <= 1.0:
+            raise RuntimeError('Overlay alpha {} not in range [0, 1]'.format(overlay_alpha))
+        self.overlay_alpha = overlay_alpha
+
+    def set_overlay_output_format(self, overlay_output_format):
+        """ Writes the blended overlay as DICOM secondary capture ('dcm') or PNG ('png') """
+        if overlay_output_format not in OVERLAY_OUTPUT_FORMATS:
+            raise RuntimeError('Unknown overlay output format {}'.format(overlay_output_format))
+        self.overlay_output_format = overlay_output_format
+
     def set_verbose(self, verbose):
         self.verbose = verbose
 
     @staticmethod
     def apply_ct_window(pix, window):
-        result = (pix - window[1] + 0.5 * window[0])/window[0]
-        result[result < 0] = 0
-        result[result > 1] = 1
-        return result
+        return apply_ct_window(pix, window)
 
     @staticmethod
     def get_color_map():
@@ -105,40 +165,85 @@ class Tag2Dcm:
                 color_map.append([0, 0, 0])
         return color_map
 
-    def execute(self):
-        p = pydicom.dcmread(self.dcm_file)
+    @staticmethod
+    def get_color_lut():
+        """ Returns get_color_map() as a read-only (256, 3) uint8 lookup table, built once """
+        return _get_color_lut()
+
+    @staticmethod
+    def read_header(dcm_file):
+        # Only the header is needed from the dataset, the pixels come from the shared pixel cache
+        p = pydicom.dcmread(dcm_file, stop_before_pixels=True)
         if p.file_meta.TransferSyntaxUID.is_compressed:
-            p.decompress()
-        pixels = p.pixel_array
-        pixels = pixels * p.RescaleSlope + p.RescaleIntercept
-        pixels = self.apply_ct_window(pixels, [400, 50])
-        pixels = pixels.astype(float)
-        pixels_org = pixels.copy()
+            p.file_meta.TransferSyntaxUID = pydicom.uid.ExplicitVRLittleEndian
+        return p
+
+    @staticmethod
+    def get_tag_pixels(dcm_file, tag_file):
+        # The TAG header declares the label map dimensions, fall back on the DICOM header if it doesn't
+        shape = TagHeader.read(tag_file).get_shape() or get_dicom_geometry(dcm_file).get_shape()
+        converter = tag2numpy.Tag2NumPy(shape)
+        converter.set_input_tag_file_path(tag_file)
+        converter.execute()
+        return converter.get_output_numpy_array()
+
+    @staticmethod
+    def check_tag_pixels(p, pixels_tag, dcm_file, label_file):
+        """ Raises RuntimeError if the label map pixels_tag is missing or does not match the
+        shape of header-only dataset p. The CT pixels are never decoded for the overlay
+        """
+        if pixels_tag is None or pixels_tag.shape != (p.Rows, p.Columns):
+            raise RuntimeError('File {} does not match shape of DICOM file {}'.format(label_file, dcm_file))
+
+    @staticmethod
+    def get_overlay_pixels(pixels_tag):
+        return np.take(Tag2Dcm.get_color_lut(), pixels_tag, axis=0)
+
+    @staticmethod
+    def get_blend_lut(alpha):
+        """ Returns a (256 * 256, 3) uint8 lookup table of blended RGB values indexed by
+        label * 256 + windowed gray value. Labels without color keep their gray value
+        """
+        return _get_blend_lut(float(alpha))
+
+    @staticmethod
+    def get_blended_overlay_pixels(pixels, pixels_tag, alpha):
+        """ Blends the label colors of pixels_tag over uint8 windowed CT pixels in one lookup """
+        index = pixels_tag.astype(np.uint32) << 8
+        index |= pixels
+        return np.take(Tag2Dcm.get_blend_lut(alpha), index, axis=0)
+
+    @staticmethod
+    def set_overlay_pixels(p, pixels_new):
+        """ Turns header-only dataset p into an RGB dataset holding pixels_new """
+        for tag, vr, value in OVERLAY_PIXEL_MODULE:
+            p.add_new(tag, vr, value)
+        p.is_little_endian = True
+        # Equivalent of p.fix_meta_info() for datasets read from a valid DICOM file
+        p.file_meta.MediaStorageSOPClassUID = p.SOPClassUID
+        p.file_meta.MediaStorageSOPInstanceUID = p.SOPInstanceUID
+        p.add_new(0x7fe00010, 'OB', pixels_new.tobytes())
+        p.SOPInstanceUID = '{}.9999'.format(p.SOPInstanceUID)
+        return p
+
+    def execute(self):
+        p = self.read_header(self.dcm_file)
         if self.tag_file is not None:
-            converter = tag2numpy.Tag2NumPy(pixels.shape)
-            converter.set_input_tag_file_path(self.tag_file)
-            converter.execute()
-            pixels_tag = converter.get_output_numpy_array()
+            pixels_tag = self.get_tag_pixels(self.dcm_file, self.tag_file)
         elif self.numpy_file is not None:
             pixels_tag = np.load(self.numpy_file)
-<<<<<<< HEAD
         else:
             raise RuntimeError('Both TAG file and NumPy file paths are None')
-=======
-            # pixels_tag = pixels_tag.reshape(pixels.shape)
->>>>>>> 0f2fbd542d55d5d6c5f5b973500bd8fee74ac83e
-        pixels_new = np.zeros((*pixels_tag.shape, 3), dtype=np.uint8)
-        np.take(self.get_color_map(), pixels_tag, axis=0, out=pixels_new)
-        p.PhotometricInterpretation = 'RGB'
-        p.SamplesPerPixel = 3
-        p.BitsAllocated = 8
-        p.BitsStored = 8
-        p.HighBit = 7
-        p.add_new(0x00280006, 'US', 0)
-        p.is_little_endian = True
-        p.fix_meta_info()
-        p.PixelData = pixels_new.tobytes()
-        p.SOPInstanceUID = '{}.9999'.format(p.SOPInstanceUID)
+        self.check_tag_pixels(p, pixels_tag, self.dcm_file, self.tag_file or self.numpy_file)
+        if self.overlay_alpha is None:
+            pixels_new = self.get_overlay_pixels(pixels_tag)
+        else:
+            pixels_org = window_pixels(read_dicom_pixels(self.dcm_file), [DEFAULT_CT_WINDOW], *get_rescale(p))[0]
+            pixels_new = self.get_blended_overlay_pixels(pixels_org, pixels_tag, self.overlay_alpha)
+            # The blended image is derived from the CT, so store it as secondary capture
+            p.SOPClassUID = pydicom.uid.SecondaryCaptureImageStorage
+            p.ConversionType = 'WSD'
+        self.set_overlay_pixels(p, pixels_new)
         # TODO: ==================
         # TODO: Rethink this code and what to do when either self.tag_file or self.numpy_file is None
         # TODO: I think I'm mixing responsibilities too much here.
@@ -154,23 +259,60 @@ class Tag2Dcm:
         if self.copy_original_numpy_file_to_output_dir and self.numpy_file is not None:
             self.output_numpy_file = os.path.join(self.output_dir, os.path.split(self.numpy_file)[1])
             shutil.copy(self.numpy_file, self.output_dir)
+        if self.overlay_alpha is not None:
+            self._write_blended_overlay(p, pixels_new)
+            return
         if self.tag_file is not None:
             self.output_tag_dcm_file = os.path.join(self.output_dir, os.path.split(self.tag_file)[1] + '.dcm')
             p.save_as(self.output_tag_dcm_file)
         if self.create_pngs:
-            fig = plt.figure(figsize=self.png_figure_size)
-            ax = fig.add_subplot(1, 1, 1)
-            plt.imshow(pixels_org, cmap='gray')
-            ax.axis('off')
-            self.output_dcm_png_file = os.path.join(self.output_dir, self.get_output_dcm_file_name() + '.png')
-            plt.savefig(self.output_dcm_png_file, bbox_inches='tight')
-            fig = plt.figure(figsize=self.png_figure_size)
-            ax = fig.add_subplot(1, 1, 1)
-            plt.imshow(pixels_new)
-            ax.axis('off')
-            self.output_tag_dcm_png_file = os.path.join(self.output_dir, self.get_output_tag_dcm_file_name() + '.png')
-            plt.savefig(self.output_tag_dcm_png_file, bbox_inches='tight')
-            plt.close('all')
+            # The CT pixels are only needed for the PNGs, the overlay DICOM only uses its header
+            pixels_org = window_pixels(read_dicom_pixels(self.dcm_file), [DEFAULT_CT_WINDOW], *get_rescale(p))[0]
+            self.output_dcm_png_file, self.output_tag_dcm_png_file = self._get_png_files()
+            if self.fast_png_enabled:
+                self._write_fast_pngs(pixels_org, pixels_new)
+            else:
+                self._write_matplotlib_pngs(pixels_org, pixels_new)
+
+    def _write_blended_overlay(self, p, pixels_new):
+        # A single output per slice, the CT is visible underneath the labels
+        base_name = os.path.split(self.tag_file or self.numpy_file)[1]
+        if self.overlay_output_format == 'dcm':
+            self.output_tag_dcm_file = os.path.join(self.output_dir, base_name + '.dcm')
+            p.save_as(self.output_tag_dcm_file)
+        else:
+            self.output_blend_png_file = os.path.join(self.output_dir, base_name + '.png')
+            if self.thumbnail_size:
+                pixels_new = get_thumbnail(pixels_new, self.thumbnail_size)
+            write_png(self.output_blend_png_file, pixels_new)
+
+    def _get_png_files(self):
+        dcm_file = self.output_dcm_file or self.dcm_file
+        tag_dcm_file = self.output_tag_dcm_file or (self.numpy_file + '.dcm')
+        return (
+            os.path.join(self.output_dir, os.path.split(dcm_file)[1] + '.png'),
+            os.path.join(self.output_dir, os.path.split(tag_dcm_file)[1] + '.png'),
+        )
+
+    def _write_fast_pngs(self, pixels_org, pixels_new):
+        for pixels, png_file in [(pixels_org, self.output_dcm_png_file), (pixels_new, self.output_tag_dcm_png_file)]:
+            if self.thumbnail_size:
+                pixels = get_thumbnail(pixels, self.thumbnail_size)
+            write_png(png_file, pixels)
+
+    def _write_matplotlib_pngs(self, pixels_org, pixels_new):
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=self.png_figure_size)
+        ax = fig.add_subplot(1, 1, 1)
+        plt.imshow(pixels_org, cmap='gray', vmin=0, vmax=255)
+        ax.axis('off')
+        plt.savefig(self.output_dcm_png_file, bbox_inches='tight')
+        fig = plt.figure(figsize=self.png_figure_size)
+        ax = fig.add_subplot(1, 1, 1)
+        plt.imshow(pixels_new)
+        ax.axis('off')
+        plt.savefig(self.output_tag_dcm_png_file, bbox_inches='tight')
+        plt.close('all')
 
     def get_output_dcm_file(self):
         return self.output_dcm_file
@@ -208,6 +350,9 @@ class Tag2Dcm:
     def get_output_tag_dcm_png_file_name(self):
         return os.path.split(self.get_output_tag_dcm_png_file())[1]
 
+    def get_output_blend_png_file(self):
+        return self.output_blend_png_file
+
 
 if __name__ == '__main__':
     t2d = Tag2Dcm()
@@ -0,0 +1,105 @@
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from barbell2light.dicom import iter_dicom_tag_pairs
+from barbell2light.dicom.tag2dcm import Tag2Dcm
+
+
+TAG2DCM_STAGES = ['read_header', 'decode_tag', 'overlay', 'write']
+
+
+def create_overlay(dcm_file, tag_file, output_dir):
+    """ Writes the RGB overlay DICOM of a DICOM+TAG pair, like Tag2Dcm.execute(), and returns
+    the output file and the time in seconds spent in each stage.
+    """
+    timings = {}
+    start = time.perf_counter()
+    p = Tag2Dcm.read_header(dcm_file)
+    timings['read_header'] = time.perf_counter() - start
+    start = time.perf_counter()
+    pixels_tag = Tag2Dcm.get_tag_pixels(dcm_file, tag_file)
+    Tag2Dcm.check_tag_pixels(p, pixels_tag, dcm_file, tag_file)
+    timings['decode_tag'] = time.perf_counter() - start
+    start = time.perf_counter()
+    Tag2Dcm.set_overlay_pixels(p, Tag2Dcm.get_overlay_pixels(pixels_tag))
+    timings['overlay'] = time.perf_counter() - start
+    start = time.perf_counter()
+    output_file = os.path.join(output_dir, os.path.split(tag_file)[1] + '.dcm')
+    p.save_as(output_file)
+    timings['write'] = time.perf_counter() - start
+    return output_file, timings
+
+
+def _create_overlay(args):
+    dcm_file, tag_file, output_dir = args
+    try:
+        output_file, timings = create_overlay(dcm_file, tag_file, output_dir)
+        return dcm_file, output_file, timings, None
+    except Exception as e:
+        return dcm_file, None, None, str(e)
+
+
+class Tag2DcmBatch(object):
+    """ Creates Tag2Dcm RGB overlays for many DICOM+TAG pairs across a process pool. The color
+    lookup table is built once per process. Only the DICOM header is parsed for each output
+    dataset and the CT pixels are never decoded. Per-stage timings are summed over all files.
+    """
+
+    def __init__(self):
+        self._input_files = []
+        self._output_dir = '.'
+        self._nr_workers = os.cpu_count()
+        self._verbose = False
+        self._output_files = None
+        self._errors = None
+        self._timings = None
+
+    def set_input_files(self, dcm_and_tag_files):
+        self._input_files = list(dcm_and_tag_files)
+
+    def set_input_dir(self, d):
+        self._input_files = list(iter_dicom_tag_pairs(d))
+
+    def set_output_dir(self, output_dir):
+        self._output_dir = output_dir
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_output_files(self):
+        return self._output_files
+
+    def get_errors(self):
+        return self._errors
+
+    def get_timings(self):
+        return self._timings
+
+    def execute(self):
+        os.makedirs(self._output_dir, exist_ok=True)
+        self._output_files = {}
+        self._errors = {}
+        self._timings = dict([(stage, 0.0) for stage in TAG2DCM_STAGES])
+        start = time.perf_counter()
+        args = [(dcm_file, tag_file, self._output_dir) for dcm_file, tag_file in self._input_files]
+        with ProcessPoolExecutor(max_workers=self._nr_workers) as executor:
+            for dcm_file, output_file, timings, error in executor.map(_create_overlay, args, chunksize=8):
+                if error is not None:
+                    self._errors[dcm_file] = error
+                    print('Error: {}: {}'.format(dcm_file, error))
+                    continue
+                self._output_files[dcm_file] = output_file
+                for stage, seconds in timings.items():
+                    self._timings[stage] += seconds
+                if self._verbose:
+                    print('Written {}'.format(output_file))
+        self._timings['total'] = time.perf_counter() - start
+        if self._verbose:
+            for stage, seconds in self._timings.items():
+                print('{:<14} {:.3f} s'.format(stage, seconds))
+        return self._output_files
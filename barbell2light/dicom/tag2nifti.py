@@ -1,10 +1,12 @@
 import os
 import numpy as np
-import binascii
-import struct
-import pydicom
 import SimpleITK as sitk
 
+from .dcmseries import DicomSeries
+from .geometry import get_dicom_geometry
+from .niftiwriter import NiftiWriter
+from .tagdecoder import read_tag_pixels
+
 
 class Tag2Nifti(object):
 
@@ -18,6 +20,8 @@ class Tag2Nifti(object):
         self._origin = None
         self._direction = None
         self._overwrite_output = False
+        self._input_file_pairs = None
+        self._nifti_writer = NiftiWriter()
 
     # INTERFACE
 
@@ -27,9 +31,19 @@ class Tag2Nifti(object):
     def set_input_tag_file_path(self, file_path):
         self._input_tag_file_path = file_path
 
+    def set_input_file_pairs(self, dcm_and_tag_files):
+        """ Enables series mode. Given (DICOM file, TAG file) pairs of a single series, execute()
+        writes one 3D label volume, ordered along the slice normal, instead of one file per slice.
+        """
+        self._input_file_pairs = list(dcm_and_tag_files)
+
     def set_output_dir(self, output_dir):
         self._output_dir = output_dir
 
+    def set_output_format(self, output_format, compression_level=None, nr_threads=1):
+        """ Sets output format 'nii' or 'nii.gz', see NiftiWriter """
+        self._nifti_writer.set_output_format(output_format, compression_level, nr_threads)
+
     def get_output_file_path(self):
         return self._output_file_path
 
@@ -39,83 +53,68 @@ class Tag2Nifti(object):
         # INTERNAL METHODS
 
     def _get_info_from_dicom(self, f):
-        p = pydicom.read_file(f)
+        geometry = get_dicom_geometry(f)
         # Make sure to put the 1 at the front because the NumPy indexing is differently ordered than
         # SimpleITK pixel indexing
-        self._shape = (1, p.Rows, p.Columns)
-        self._spacing = (float(p.PixelSpacing[0]), float(p.PixelSpacing[1]), 1.0)
-        self._origin = (
-            float(p.ImagePositionPatient[0]),
-            float(p.ImagePositionPatient[1]),
-            float(p.ImagePositionPatient[2])
-        )
-        self._direction = (
-            float(p.ImageOrientationPatient[0]),
-            float(p.ImageOrientationPatient[1]),
-            float(p.ImageOrientationPatient[2]),
-            float(p.ImageOrientationPatient[3]),
-            float(p.ImageOrientationPatient[4]),
-            float(p.ImageOrientationPatient[5]),
-            0, 0, 1,
-        )
+        self._shape = (1, geometry.rows, geometry.columns)
+        self._spacing = (geometry.pixel_spacing[0], geometry.pixel_spacing[1], 1.0)
+        self._origin = geometry.get_origin()
+        self._direction = geometry.get_direction()
 
     @staticmethod
     def _get_pixels(tag_file_path):
-        f = open(tag_file_path, 'rb')
-        f.seek(0)
-        byte = f.read(1)
-        # Make sure to check the byte-value in Python 3!!
-        while byte != b'':
-            byte_hex = binascii.hexlify(byte)
-            if byte_hex == b'0c':
-                break
-            byte = f.read(1)
-        values = []
-        f.read(1)
-        while byte != b'':
-            v = struct.unpack('b', byte)
-            values.append(v)
-            byte = f.read(1)
-        values = np.asarray(values)
-        values = values.astype(np.uint16)
-        return values
+        return read_tag_pixels(tag_file_path)
+
+    def _write_image(self, image, file_name):
+        file_path = os.path.join(self._output_dir, file_name + self._nifti_writer.get_extension())
+        try:
+            os.stat(file_path)
+            if not self._overwrite_output:
+                print('Error: file {} already exists!'.format(file_path))
+                return
+        except FileNotFoundError:
+            pass
+        self._output_file_path = file_path
+        self._nifti_writer.execute(image, self._output_file_path)
+        print('Written {}'.format(self._output_file_path))
+
+    @staticmethod
+    def _get_file_base_name(file_path):
+        return os.path.splitext(os.path.split(file_path)[1])[0]
 
     # EXECUTE
 
+    def _execute_series(self):
+        tag_files = dict(self._input_file_pairs)
+        series_instance_uids = set([get_dicom_geometry(f).series_instance_uid for f in tag_files.keys()])
+        if len(series_instance_uids) != 1:
+            raise RuntimeError('DICOM files belong to {} different series'.format(len(series_instance_uids)))
+        series = DicomSeries(series_instance_uids.pop(), list(tag_files.keys()))
+        shape = series.get_shape()
+        pixels = np.empty(shape, dtype=np.uint16)
+        for i, f in enumerate(series.get_files()):
+            pixels[i] = self._get_pixels(tag_files[f]).reshape(shape[1:])
+        geometry = series.get_geometry()
+        row, column = geometry.image_orientation[:3], geometry.image_orientation[3:]
+        direction = np.column_stack([row, column, geometry.get_slice_normal()])
+        image = sitk.GetImageFromArray(pixels)
+        image.SetSpacing(series.get_spacing())
+        image.SetOrigin(geometry.get_origin())
+        image.SetDirection(tuple(float(x) for x in direction.ravel()))
+        self._write_image(image, '{}_tag_series'.format(self._get_file_base_name(tag_files[series.get_files()[0]])))
+
     def execute(self):
+        if self._input_file_pairs is not None:
+            self._execute_series()
+            return
         self._get_info_from_dicom(self._input_dicom_file_path)
         pixels = self._get_pixels(self._input_tag_file_path)
-        # labels = {}
-        # for p in pixels:
-        #     p = str(p[0])
-        #     if p not in labels:
-        #         labels[p] = 0
-        #     labels[p] += 1
-        # print(json.dumps(labels, indent=4))
         pixels.shape = self._shape
         image = sitk.GetImageFromArray(pixels)
         image.SetSpacing(self._spacing)
         image.SetOrigin(self._origin)
         image.SetDirection(self._direction)
-        writer = sitk.ImageFileWriter()
-        file_name = os.path.split(self._input_tag_file_path)
-        file_name = file_name[1]
-        file_name = os.path.splitext(file_name)
-        file_name = file_name[0]
-        file_name = '{}_tag.nii.gz'.format(file_name)
-        file_path = os.path.join(self._output_dir, file_name)
-        try:
-            os.stat(file_path)
-            if not self._overwrite_output:
-                print('Error: file {} already exists!'.format(file_path))
-                return
-        except FileNotFoundError:
-            pass
-        self._output_file_path = file_path
-        writer.SetFileName(self._output_file_path)
-        writer.SetImageIO('NiftiImageIO')
-        writer.Execute(image)
-        print('Written {}'.format(self._output_file_path))
+        self._write_image(image, '{}_tag'.format(self._get_file_base_name(self._input_tag_file_path)))
 
 
 if __name__ == '__main__':
@@ -1,6 +1,5 @@
-import numpy as np
-import binascii
-import struct
+from .tagdecoder import read_tag_pixels, map_tag_pixels
+from .tagheader import TagHeader
 
 
 class Tag2NumPy(object):
@@ -10,36 +9,37 @@ class Tag2NumPy(object):
         self._output_dir = '.'
         self._output_numpy_array = None
         self._shape = shape
+        self._mmap_enabled = False
+        self._infer_shape_enabled = False
 
     def set_input_tag_file_path(self, file_path):
         self._input_tag_file_path = file_path
 
+    def set_mmap_enabled(self, enabled=True):
+        self._mmap_enabled = enabled
+
+    def set_infer_shape_enabled(self, enabled=True):
+        self._infer_shape_enabled = enabled
+
     def get_output_numpy_array(self):
         return self._output_numpy_array
 
     @staticmethod
     def _get_pixels(tag_file_path):
-        f = open(tag_file_path, 'rb')
-        f.seek(0)
-        byte = f.read(1)
-        # Make sure to check the byte-value in Python 3!!
-        while byte != b'':
-            byte_hex = binascii.hexlify(byte)
-            if byte_hex == b'0c':
-                break
-            byte = f.read(1)
-        values = []
-        f.read(1)
-        while byte != b'':
-            v = struct.unpack('b', byte)
-            values.append(v)
-            byte = f.read(1)
-        values = np.asarray(values)
-        values = values.astype(np.uint16)
-        return values
+        pixels = read_tag_pixels(tag_file_path)
+        if pixels.size == 0:
+            return pixels
+        # Keep the (N, 1) column layout of the original per-byte decoder
+        return pixels.reshape((-1, 1))
 
     def execute(self):
-        self._output_numpy_array = self._get_pixels(self._input_tag_file_path)
+        if self._shape is None and self._infer_shape_enabled:
+            self._shape = TagHeader.read(self._input_tag_file_path).get_shape()
+        if self._mmap_enabled:
+            # Returns a flat, read-only uint8 view on the file instead of an in-memory copy
+            self._output_numpy_array = map_tag_pixels(self._input_tag_file_path)
+        else:
+            self._output_numpy_array = self._get_pixels(self._input_tag_file_path)
         try:
             if self._shape:
                 self._output_numpy_array = self._output_numpy_array.reshape(self._shape)
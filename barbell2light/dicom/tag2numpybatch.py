@@ -0,0 +1,140 @@
+import os
+import json
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from barbell2light.utils import current_time_secs, elapsed_secs
+from .tagdecoder import map_tag_pixels
+from .tagheader import TagHeader
+
+
+def _decode_tag_file(f):
+    try:
+        shape = TagHeader.read(f).get_shape()
+        if shape is None:
+            return f, None
+        # The label bytes as stored, like the mmap path of Tag2NumPy and the body composition
+        # statistics, so shards agree with them (read_tag_pixels() replaces the first value)
+        return f, np.array(map_tag_pixels(f, shape))
+    except (RuntimeError, ValueError, TypeError):
+        return f, None
+
+
+class Tag2NumPyBatch(object):
+    """ Decodes all .tag files in a directory tree in parallel and writes the label maps as
+    stacked uint8 arrays in .npy shards of at most shard_size slices. Label maps of different
+    shapes go into different shards. The file index.json in the output directory maps each
+    TAG file to its shard file and the offset inside that shard.
+    """
+
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self):
+        self._input_dir = None
+        self._output_dir = '.'
+        self._output_index_file_path = None
+        self._shard_size = 1024
+        self._nr_workers = os.cpu_count()
+        self._verbose = False
+
+    def set_input_dir(self, input_dir):
+        self._input_dir = input_dir
+
+    def set_output_dir(self, output_dir):
+        self._output_dir = output_dir
+
+    def set_shard_size(self, shard_size):
+        self._shard_size = shard_size
+
+    def set_nr_workers(self, nr_workers):
+        self._nr_workers = nr_workers
+
+    def set_verbose(self, verbose):
+        self._verbose = verbose
+
+    def get_output_index_file_path(self):
+        return self._output_index_file_path
+
+    def _get_tag_files(self):
+        tag_files = []
+        for root, dirs, files in os.walk(self._input_dir):
+            for f in files:
+                if f.endswith('.tag') and not f.startswith('._'):
+                    tag_files.append(os.path.join(root, f))
+        return sorted(tag_files)
+
+    def _write_shard(self, shard, index):
+        shape_name = 'x'.join([str(x) for x in shard['pixels'].shape[1:]])
+        file_name = 'shard_{}_{:05d}.npy'.format(shape_name, shard['nr'])
+        np.save(os.path.join(self._output_dir, file_name), shard['pixels'][:shard['count']])
+        for offset, f in enumerate(shard['files']):
+            index[f] = {'shard': file_name, 'offset': offset}
+        if self._verbose:
+            print('Written {} ({} slices)'.format(file_name, shard['count']))
+        shard['nr'] += 1
+        shard['count'] = 0
+        shard['files'] = []
+
+    def execute(self):
+        if self._input_dir is None:
+            raise RuntimeError('Input directory not set')
+        os.makedirs(self._output_dir, exist_ok=True)
+        start = current_time_secs()
+        tag_files = self._get_tag_files()
+        shards = {}
+        index = {}
+        with ProcessPoolExecutor(max_workers=self._nr_workers) as executor:
+            for f, pixels in executor.map(_decode_tag_file, tag_files, chunksize=16):
+                if pixels is None:
+                    print('Could not decode TAG file {}'.format(f))
+                    continue
+                shard = shards.get(pixels.shape)
+                if shard is None:
+                    shard = {
+                        'pixels': np.empty((self._shard_size, *pixels.shape), dtype=np.uint8),
+                        'count': 0, 'nr': 0, 'files': []}
+                    shards[pixels.shape] = shard
+                shard['pixels'][shard['count']] = pixels
+                shard['count'] += 1
+                shard['files'].append(f)
+                if shard['count'] == self._shard_size:
+                    self._write_shard(shard, index)
+        for shard in shards.values():
+            if shard['count'] > 0:
+                self._write_shard(shard, index)
+        self._output_index_file_path = os.path.join(self._output_dir, self.INDEX_FILE_NAME)
+        with open(self._output_index_file_path, 'w') as f:
+            json.dump(index, f, indent=4)
+        if self._verbose:
+            print('Converted {} TAG files in {} seconds'.format(len(index), elapsed_secs(start)))
+
+    @staticmethod
+    def load(index_file_path, tag_file_path, mmap=True):
+        """ Returns the label map of the given TAG file from the shard it was written to """
+        with open(index_file_path, 'r') as f:
+            entry = json.load(f)[tag_file_path]
+        shard_file_path = os.path.join(os.path.split(index_file_path)[0], entry['shard'])
+        pixels = np.load(shard_file_path, mmap_mode='r' if mmap else None)
+        return pixels[entry['offset']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts TAG files to sharded NumPy label arrays')
+    parser.add_argument('input_dir', help='Directory containing .tag files (searched recursively)')
+    parser.add_argument('output_dir', help='Directory to write shards and index.json to')
+    parser.add_argument('--shard_size', type=int, default=1024, help='Maximum number of slices per shard')
+    parser.add_argument('--nr_workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    args = parser.parse_args()
+    batch = Tag2NumPyBatch()
+    batch.set_input_dir(args.input_dir)
+    batch.set_output_dir(args.output_dir)
+    batch.set_shard_size(args.shard_size)
+    batch.set_nr_workers(args.nr_workers)
+    batch.set_verbose(True)
+    batch.execute()
+
+
+if __name__ == '__main__':
+    main()
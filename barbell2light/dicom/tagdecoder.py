@@ -0,0 +1,98 @@
+import os
+import numpy as np
+
+
+TAG_HEADER_TERMINATOR = b'\x0c'
+TAG_HEADER_CHUNK_SIZE = 4096
+
+
+def find_tag_header_terminator(buffer):
+    """ Returns the offset of the 0x0c byte that ends the TAG header or -1 if the buffer
+    does not contain one. Works on bytes, bytearray and mmap objects.
+    """
+    return buffer.find(TAG_HEADER_TERMINATOR)
+
+
+def decode_tag_buffer(buffer, dtype=np.uint16):
+    """ Decodes the label map contained in a TAG file buffer into a flat NumPy array.
+
+    The values are identical to the byte-by-byte decoder used previously: bytes are read
+    as signed 8-bit integers and cast to dtype, the first value is the 0x0c terminator
+    itself and the byte directly following it is skipped.
+    """
+    terminator = find_tag_header_terminator(buffer)
+    if terminator < 0:
+        return np.zeros((0,), dtype=dtype)
+    data = np.frombuffer(memoryview(buffer)[terminator + 2:], dtype=np.int8)
+    pixels = np.empty((data.size + 1,), dtype=dtype)
+    pixels[0] = TAG_HEADER_TERMINATOR[0]
+    pixels[1:] = data
+    return pixels
+
+
+def read_tag_pixels(tag_file_path, dtype=np.uint16):
+    with open(tag_file_path, 'rb') as f:
+        buffer = f.read()
+    return decode_tag_buffer(buffer, dtype)
+
+
+def encode_tag_buffer(pixels, header_text):
+    """ Encodes a label map and header text into the bytes of a TAG file. Labels are stored
+    as one byte per pixel in row-major order directly after the header terminator.
+    """
+    pixels = np.asarray(pixels)
+    if pixels.dtype != np.uint8 and pixels.size > 0 and (pixels.min() < 0 or pixels.max() > 255):
+        raise RuntimeError('Label values must be in range [0, 255]')
+    data = np.ascontiguousarray(pixels, dtype=np.uint8)
+    return b''.join([header_text.encode('ASCII'), TAG_HEADER_TERMINATOR, data.tobytes()])
+
+
+def write_tag_file(tag_file_path, pixels, header_text):
+    buffer = encode_tag_buffer(pixels, header_text)
+    with open(tag_file_path, 'wb') as f:
+        f.write(buffer)
+
+
+def read_tag_header_bytes(tag_file_path):
+    """ Reads a TAG file up to the header terminator and returns the header bytes (without
+    the terminator), or None if the file has no terminator.
+    """
+    header = b''
+    with open(tag_file_path, 'rb') as f:
+        chunk = f.read(TAG_HEADER_CHUNK_SIZE)
+        while chunk != b'':
+            start = len(header)
+            header += chunk
+            terminator = header.find(TAG_HEADER_TERMINATOR, start)
+            if terminator >= 0:
+                return header[:terminator]
+            chunk = f.read(TAG_HEADER_CHUNK_SIZE)
+    return None
+
+
+def find_tag_pixel_offset(tag_file_path):
+    """ Returns the file offset of the first label byte (the byte after the header
+    terminator) by reading only the header, or -1 if the file has no terminator.
+    """
+    header = read_tag_header_bytes(tag_file_path)
+    if header is None:
+        return -1
+    return len(header) + 1
+
+
+def map_tag_pixels(tag_file_path, shape=None):
+    """ Memory-maps the label bytes of a TAG file and returns a read-only uint8 view
+    on them. Nothing is loaded until the view is accessed.
+
+    Contrary to read_tag_pixels() the view contains the label bytes exactly as stored,
+    so the first value is not replaced by the header terminator.
+    """
+    offset = find_tag_pixel_offset(tag_file_path)
+    size = os.path.getsize(tag_file_path)
+    if offset < 0 or offset >= size:
+        pixels = np.zeros((0,), dtype=np.uint8)
+    else:
+        pixels = np.memmap(tag_file_path, dtype=np.uint8, mode='r', offset=offset, shape=(size - offset,))
+    if shape:
+        pixels = pixels.reshape(shape)
+    return pixels
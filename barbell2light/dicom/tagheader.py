@@ -0,0 +1,203 @@
+import os
+import re
+import json
+
+from collections import Counter
+
+from .tagdecoder import read_tag_header_bytes
+
+
+class TagHeader(object):
+    """ Decoded TomoVision TAG header. The header is a block of ASCII text made of
+    whitespace-separated <key>:<value> tokens, e.g. "x:512 y:512 z:1 type:BYTE", followed
+    by the 0x0c terminator.
+    """
+
+    def __init__(self, text=''):
+        self._text = text
+        self._fields = self.parse(text)
+
+    @staticmethod
+    def parse(text):
+        fields = {}
+        for token in text.split():
+            key, sep, value = token.partition(':')
+            if sep:
+                fields[key] = value
+        return fields
+
+    @staticmethod
+    def read(tag_file_path):
+        header = read_tag_header_bytes(tag_file_path)
+        if header is None:
+            raise RuntimeError(f'File {tag_file_path} has no TAG header terminator')
+        return TagHeader(header.decode('ASCII', errors='replace'))
+
+    @staticmethod
+    def from_shape(shape):
+        header = TagHeader('x:{}    y:{}    z:1      type:BYTE \n'.format(shape[-1], shape[-2]))
+        if len(shape) > 2:
+            header.set('z', shape[0])
+        return header
+
+    def set(self, key, value):
+        """ Sets the value of a header field. Existing fields are updated in place, keeping
+        the column layout of the header text where possible. New fields are appended.
+        """
+        value = str(value)
+        match = re.search(r'(?<!\S){}:(\S*)([ \t]*)'.format(re.escape(key)), self._text)
+        if match is None:
+            if self._text and not self._text.endswith('\n'):
+                self._text += '\n'
+            self._text += '{}:{} \n'.format(key, value)
+        else:
+            spaces = match.group(2)
+            if spaces:
+                width = len(match.group(1)) + len(spaces)
+                spaces = spaces[-1] * max(1, width - len(value))
+            self._text = self._text[:match.start()] + '{}:{}{}'.format(key, value, spaces) + self._text[match.end():]
+        self._fields[key] = value
+
+    def get_text(self):
+        return self._text
+
+    def get_fields(self):
+        return dict(self._fields)
+
+    def get(self, key, default=None):
+        return self._fields.get(key, default)
+
+    def _get_int(self, key, default=None):
+        value = self._fields.get(key)
+        return default if value is None else int(float(value))
+
+    def _get_float(self, key, default=None):
+        value = self._fields.get(key)
+        return default if value is None else float(value)
+
+    def get_dimensions(self):
+        """ Returns (x, y, z) as declared in the header """
+        return self._get_int('x'), self._get_int('y'), self._get_int('z', 1)
+
+    def get_shape(self):
+        """ Returns the label map shape in NumPy order, i.e. (rows, columns) for a single
+        slice or (slices, rows, columns) otherwise. Returns None if x or y is missing.
+        """
+        x, y, z = self.get_dimensions()
+        if x is None or y is None:
+            return None
+        if z is None or z <= 1:
+            return y, x
+        return z, y, x
+
+    def get_pixel_type(self):
+        return self._fields.get('type')
+
+    def get_origin(self):
+        return self._get_float('org_x'), self._get_float('org_y'), self._get_float('org_z')
+
+    def get_spacing(self):
+        """ Returns (inc_x, inc_y, slice thickness) """
+        return self._get_float('inc_x'), self._get_float('inc_y'), self._get_float('epais')
+
+    def get_direction(self):
+        return (
+            self._get_float('dir_h_x'), self._get_float('dir_h_y'), self._get_float('dir_h_z'),
+            self._get_float('dir_v_x'), self._get_float('dir_v_y'), self._get_float('dir_v_z'),
+        )
+
+    def to_dict(self):
+        return {
+            'shape': self.get_shape(),
+            'type': self.get_pixel_type(),
+            'origin': self.get_origin(),
+            'spacing': self.get_spacing(),
+            'direction': self.get_direction(),
+        }
+
+
+class TagHeaderIndex(object):
+    """ Header texts of all .tag files in a directory tree, kept in memory and saved as JSON.
+    Only the header is read from each TAG file, and update() skips files whose size and
+    modification time did not change. Shapes and other header fields can then be compared
+    across a cohort without reading the label maps.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def update(self, d, verbose=False):
+        found = set()
+        nr_read = 0
+        for root, dirs, files in os.walk(d):
+            for f in files:
+                if not f.endswith('.tag') or f.startswith('._'):
+                    continue
+                f = os.path.join(root, f)
+                try:
+                    stat = os.stat(f)
+                except OSError as e:
+                    # E.g. deleted during the walk, its entry is removed below
+                    if verbose:
+                        print(e)
+                    continue
+                found.add(f)
+                entry = self._entries.get(f)
+                if entry is not None and entry.get('mtime_ns') == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+                try:
+                    text = TagHeader.read(f).get_text()
+                except RuntimeError as e:
+                    # No stale header remains for a file that changed
+                    self._entries.pop(f, None)
+                    if verbose:
+                        print(e)
+                    continue
+                self._entries[f] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'header': text}
+                nr_read += 1
+        root_dir = os.path.join(d, '')
+        for f in list(self._entries.keys()):
+            if f.startswith(root_dir) and f not in found:
+                del self._entries[f]
+        if verbose:
+            print('Read {} headers, index contains {} files'.format(nr_read, len(self._entries)))
+        return nr_read
+
+    def save(self, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(self._entries, f)
+
+    def load(self, file_path):
+        with open(file_path, 'r') as f:
+            self._entries = json.load(f)
+
+    def get_files(self):
+        return list(self._entries.keys())
+
+    def get_header(self, f):
+        entry = self._entries.get(f)
+        if entry is None:
+            return None
+        return TagHeader(entry['header'])
+
+    def get_shape(self, f):
+        header = self.get_header(f)
+        if header is None:
+            return None
+        return header.get_shape()
+
+    def get_files_by_shape(self):
+        files_by_shape = {}
+        for f in self._entries.keys():
+            files_by_shape.setdefault(self.get_shape(f), []).append(f)
+        return files_by_shape
+
+    def check_consistency(self, keys=('x', 'y', 'z', 'type')):
+        """ Returns the files whose values for the given header keys differ from the values
+        found in most files of the index.
+        """
+        values = {f: tuple(self.get_header(f).get(k) for k in keys) for f in self._entries.keys()}
+        if len(values) == 0:
+            return []
+        most_common = Counter(values.values()).most_common(1)[0][0]
+        return [f for f, v in values.items() if v != most_common]
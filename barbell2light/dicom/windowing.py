@@ -0,0 +1,81 @@
+import pydicom
+import numpy as np
+
+from functools import lru_cache
+
+from barbell2light.dicom.pixelcache import read_dicom_pixels
+from barbell2light.dicom.pngwriter import to_uint8
+
+
+# (width, level) in Hounsfield units
+CT_WINDOW_PRESETS = {
+    'soft_tissue': (400, 50),
+    'bone': (1800, 400),
+    'lung': (1500, -600),
+}
+DEFAULT_CT_WINDOW = 'soft_tissue'
+
+
+def apply_ct_window(pix, window):
+    """ Maps pix to range [0, 1] for window (width, level) using floating point arithmetic """
+    result = (pix - window[1] + 0.5 * window[0])/window[0]
+    result[result < 0] = 0
+    result[result > 1] = 1
+    return result
+
+
+def get_ct_window(window):
+    """ Returns window as (width, level), where window is a preset name or a (width, level) pair """
+    if isinstance(window, str):
+        if window not in CT_WINDOW_PRESETS:
+            raise RuntimeError('Unknown CT window preset {}'.format(window))
+        return CT_WINDOW_PRESETS[window]
+    return tuple(window)
+
+
+@lru_cache(maxsize=64)
+def _get_window_luts(windows, dtype, slope, intercept):
+    dtype = np.dtype(dtype)
+    # Every possible stored value in the order of its bit pattern as unsigned integer
+    values = np.arange(2 ** (8 * dtype.itemsize)).astype('u{}'.format(dtype.itemsize)).view(dtype)
+    values = values * slope + intercept
+    luts = np.empty((len(values), len(windows)), dtype=np.uint8)
+    for i, window in enumerate(windows):
+        luts[:, i] = to_uint8(apply_ct_window(values, window))
+    luts.setflags(write=False)
+    return luts
+
+
+def get_window_lut(window, dtype, slope=1.0, intercept=0.0):
+    """ Returns a uint8 lookup table mapping stored pixel values of 8- or 16-bit integer dtype
+    to windowed gray values, with the rescale slope and intercept included. The table is
+    indexed by the stored values viewed as unsigned integers, see window_pixels().
+    """
+    return _get_window_luts((get_ct_window(window),), np.dtype(dtype).str, float(slope), float(intercept))[:, 0]
+
+
+def window_pixels(pixels, windows=(DEFAULT_CT_WINDOW,), slope=1.0, intercept=0.0):
+    """ Returns a uint8 array for each window in windows (preset names or (width, level)
+    pairs) with the stored pixels rescaled to HU and windowed. For 8- and 16-bit integer
+    pixels all windows come from a single lookup table pass, without float intermediates.
+    """
+    windows = tuple([get_ct_window(window) for window in windows])
+    pixels = np.asarray(pixels)
+    if pixels.dtype.kind not in 'iu' or pixels.dtype.itemsize > 2:
+        pixels = pixels * float(slope) + float(intercept)
+        return [to_uint8(apply_ct_window(pixels, window)) for window in windows]
+    luts = _get_window_luts(windows, pixels.dtype.str, float(slope), float(intercept))
+    result = np.take(luts, pixels.view('u{}'.format(pixels.dtype.itemsize)), axis=0)
+    return [result[..., i] for i in range(len(windows))]
+
+
+def get_rescale(p):
+    """ Returns (slope, intercept) of dataset p, defaulting to (1, 0) like read_dicom_pixels() """
+    return float(p.get('RescaleSlope', 1)), float(p.get('RescaleIntercept', 0))
+
+
+def window_dicom_pixels(f, windows=(DEFAULT_CT_WINDOW,)):
+    """ Returns window_pixels() for the stored pixels of DICOM file f """
+    p = pydicom.dcmread(f, stop_before_pixels=True, specific_tags=['RescaleSlope', 'RescaleIntercept'])
+    slope, intercept = get_rescale(p)
+    return window_pixels(read_dicom_pixels(f), windows, slope, intercept)
@@ -0,0 +1,22 @@
+"""Tests for barbell2light.dicom.bodycomposition."""
+import os
+import unittest
+
+from barbell2light.dicom.bodycomposition import BodyCompositionCalculator
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestBodyCompositionCalculator(unittest.TestCase):
+
+    def test_failed_slices_are_reported(self):
+        dcm_file = os.path.join(DATA_DIR, '10.dcm')
+        missing_file = os.path.join(DATA_DIR, 'missing.dcm')
+        tag_file = os.path.join(DATA_DIR, '10.tag')
+        calculator = BodyCompositionCalculator()
+        calculator.set_input_files([(dcm_file, tag_file), (missing_file, tag_file)])
+        calculator.set_nr_workers(1)
+        data_frame = calculator.execute()
+        self.assertEqual(list(data_frame['dcm_file']), [dcm_file])
+        self.assertEqual(list(calculator.get_errors().keys()), [missing_file])
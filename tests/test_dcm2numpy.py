@@ -0,0 +1,26 @@
+"""Tests for barbell2light.dicom.dcm2numpy."""
+import os
+import unittest
+
+import pydicom
+
+from barbell2light.dicom import get_file_pixels
+from barbell2light.dicom.dcm2numpy import Dcm2Numpy
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestDcm2Numpy(unittest.TestCase):
+
+    def setUp(self):
+        self.dcm_file = os.path.join(DATA_DIR, '10_raw.dcm')
+
+    def test_output_is_writable_and_leaves_cache_intact(self):
+        component = Dcm2Numpy()
+        component.set_input_dicom_file_path(self.dcm_file)
+        component.execute()
+        pixels = component.get_output_numpy_array()
+        pixels[0, 0] = pixels[0, 0] + 1
+        self.assertEqual(pixels[0, 0], get_file_pixels(self.dcm_file)[0, 0] + 1)
+        self.assertTrue((get_file_pixels(self.dcm_file) == pydicom.dcmread(self.dcm_file).pixel_array).all())
@@ -0,0 +1,41 @@
+"""Tests for barbell2light.dicom.dcm2png."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from barbell2light.dicom.dcm2png import dcm2png_dir
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestDcm2PngDir(unittest.TestCase):
+
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        for sub_dir in ['a', 'b']:
+            os.makedirs(os.path.join(self.input_dir, sub_dir))
+            shutil.copy(os.path.join(DATA_DIR, '10_raw.dcm'), os.path.join(self.input_dir, sub_dir, 'IM1.dcm'))
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+        shutil.rmtree(self.output_dir)
+
+    def test_same_file_names_in_different_directories(self):
+        png_files, errors = dcm2png_dir(self.input_dir, self.output_dir, nr_workers=2)
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(png_files), [
+            os.path.join(self.output_dir, 'a', 'IM1.dcm.png'),
+            os.path.join(self.output_dir, 'b', 'IM1.dcm.png'),
+        ])
+        for png_file in png_files:
+            self.assertTrue(os.path.isfile(png_file))
+
+    def test_unreadable_file_does_not_abort_batch(self):
+        with open(os.path.join(self.input_dir, 'a', 'bad.dcm'), 'wb') as f:
+            f.write(b'\0' * 128 + b'DICM')
+        png_files, errors = dcm2png_dir(self.input_dir, self.output_dir, nr_workers=2)
+        self.assertEqual(len(png_files), 2)
+        self.assertEqual(list(errors.keys()), [os.path.join(self.input_dir, 'a', 'bad.dcm')])
@@ -0,0 +1,54 @@
+"""Tests for barbell2light.dicom.decompressor."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pydicom
+
+from barbell2light.dicom import decompress
+from barbell2light.dicom.decompressor import decompress_file
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestDecompressFile(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_decompressed_16_bit_pixel_data_is_ow(self):
+        f = os.path.join(DATA_DIR, '10.dcm')
+        f_target = os.path.join(self.output_dir, '10.dcm')
+        self.assertEqual(decompress_file(f, f_target), 'decompressed')
+        p = pydicom.dcmread(f_target)
+        self.assertFalse(p.file_meta.TransferSyntaxUID.is_compressed)
+        self.assertEqual(p.BitsAllocated, 16)
+        self.assertEqual(p['PixelData'].VR, 'OW')
+        self.assertTrue((p.pixel_array == pydicom.dcmread(f).pixel_array).all())
+
+    def test_uncompressed_file_is_skipped(self):
+        f_target = os.path.join(self.output_dir, '10_raw.dcm')
+        self.assertEqual(decompress_file(os.path.join(DATA_DIR, '10_raw.dcm'), f_target), 'skipped')
+        self.assertFalse(os.path.exists(f_target))
+
+
+class TestDecompress(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_uncompressed_file_gets_a_separate_copy(self):
+        f = os.path.join(self.output_dir, '10_raw.dcm')
+        shutil.copy(os.path.join(DATA_DIR, '10_raw.dcm'), f)
+        f_target = decompress(f)
+        self.assertEqual(f_target, os.path.join(self.output_dir, '10_raw_raw.dcm'))
+        os.remove(f_target)
+        self.assertTrue(os.path.isfile(f))
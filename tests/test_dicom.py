@@ -0,0 +1,59 @@
+"""Tests for barbell2light.dicom."""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pydicom
+
+from contextlib import redirect_stdout
+
+from barbell2light.dicom import get_pixels, get_file_pixels, iter_dicom_tag_pairs
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestGetPixels(unittest.TestCase):
+
+    def setUp(self):
+        self.dcm_file = os.path.join(DATA_DIR, '10_raw.dcm')
+
+    def test_get_pixels_uses_dataset_pixel_data(self):
+        get_file_pixels(self.dcm_file)
+        p = pydicom.dcmread(self.dcm_file)
+        pixels = np.zeros_like(p.pixel_array)
+        p.PixelData = pixels.tobytes()
+        self.assertTrue((get_pixels(p) == 0).all())
+
+    def test_get_pixels_is_writable(self):
+        pixels = get_pixels(pydicom.dcmread(self.dcm_file))
+        pixels[0, 0] = 1
+        self.assertEqual(pixels[0, 0], 1)
+
+    def test_get_file_pixels(self):
+        p = pydicom.dcmread(self.dcm_file)
+        self.assertTrue((get_file_pixels(self.dcm_file) == p.pixel_array).all())
+        self.assertTrue(np.allclose(get_file_pixels(self.dcm_file, normalize=True), get_pixels(p, normalize=True)))
+
+
+class TestIterDicomTagPairs(unittest.TestCase):
+
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        for name in ['a.dcm', 'b.dcm', 'c.dcm']:
+            shutil.copy(os.path.join(DATA_DIR, '10_raw.dcm'), os.path.join(self.input_dir, name))
+        shutil.copy(os.path.join(DATA_DIR, '10.tag'), os.path.join(self.input_dir, 'a.tag'))
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+
+    def test_unpaired_files_are_reported_once(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            pairs = list(iter_dicom_tag_pairs(self.input_dir))
+        a = os.path.join(self.input_dir, 'a')
+        self.assertEqual(pairs, [(a + '.dcm', a + '.tag')])
+        self.assertEqual(output.getvalue().splitlines(),
+                         ['Could not find TAG file for 2 DICOM files in {}'.format(self.input_dir)])
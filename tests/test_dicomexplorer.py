@@ -0,0 +1,73 @@
+"""Tests for barbell2light.dicom.dicomexplorer."""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from barbell2light.dicom.dicomexplorer import DicomExplorer, DicomExplorerShell
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestDicomExplorer(unittest.TestCase):
+
+    def setUp(self):
+        self.explorer = DicomExplorer()
+        self.explorer.load_file(os.path.join(DATA_DIR, '10.dcm'), verbose=False)
+        self.explorer.load_file(os.path.join(DATA_DIR, '10_raw.dcm'), verbose=False)
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if self.explorer.header_index is not None:
+            self.explorer.header_index.close()
+        shutil.rmtree(self.output_dir)
+
+    def test_unknown_tag_name_with_header_index(self):
+        self.explorer.open_header_index(':memory:', verbose=False)
+        self.assertEqual(self.explorer.get_tag_values('NoSuchTag', verbose=False), {})
+        self.assertEqual(self.explorer.find_files('NoSuchTag', 'CT', verbose=False), [])
+        data_frame = self.explorer.get_tag_values_data_frame(['Modality', 'NoSuchTag'], verbose=False)
+        self.assertEqual(list(data_frame.columns), ['file', 'Modality', 'NoSuchTag'])
+        self.assertEqual(list(data_frame['Modality']), ['CT', 'CT'])
+        self.assertTrue(data_frame['NoSuchTag'].isna().all())
+
+    def test_tag_values_with_header_index(self):
+        self.explorer.open_header_index(':memory:', verbose=False)
+        self.assertEqual(set(self.explorer.get_tag_values('Modality', verbose=False).values()), {'CT'})
+        self.assertEqual(len(self.explorer.find_files('Modality', 'CT', verbose=False)), 2)
+
+    def test_load_file_after_opening_header_index(self):
+        self.explorer.open_header_index(':memory:', verbose=False)
+        raw_copy = os.path.join(self.output_dir, '10_raw.dcm')
+        shutil.copy(os.path.join(DATA_DIR, '10_raw.dcm'), raw_copy)
+        self.explorer.load_file(raw_copy, verbose=False)
+        self.assertIn(raw_copy, self.explorer.get_tag_values('Modality', verbose=False))
+        self.assertEqual(len(self.explorer.find_files('Modality', 'CT', verbose=False)), 3)
+
+    def test_data_frame_rows_do_not_depend_on_header_index(self):
+        # A file that cannot be read gets no row, with or without index
+        self.explorer.files.append(os.path.join(DATA_DIR, 'missing.dcm'))
+        data_frame = self.explorer.get_tag_values_data_frame(['Modality'], nr_workers=1, verbose=False)
+        self.explorer.open_header_index(':memory:', verbose=False)
+        data_frame_index = self.explorer.get_tag_values_data_frame(['Modality'], verbose=False)
+        self.assertEqual(list(data_frame_index['file']), list(data_frame['file']))
+        self.assertEqual(list(data_frame_index['Modality']), ['CT', 'CT'])
+
+    def test_unknown_tag_name_without_header_index(self):
+        self.assertEqual(self.explorer.get_tag_values('NoSuchTag', verbose=False), {})
+        values = self.explorer.get_tag_values('Modality', verbose=False)
+        self.assertEqual(set(values.values()), {'CT'})
+
+    def test_extract_tags_reports_data_frame_rows(self):
+        # A file that cannot be read gets no row
+        self.explorer.files.append(os.path.join(DATA_DIR, 'missing.dcm'))
+        shell = DicomExplorerShell()
+        shell.explorer = self.explorer
+        shell.stdout = io.StringIO()
+        output_file = os.path.join(self.output_dir, 'tag_values.csv')
+        shell.onecmd('extract_tags Modality {}'.format(output_file))
+        self.assertIn('written 2 rows', shell.stdout.getvalue())
+        with open(output_file) as f:
+            self.assertEqual(len(f.readlines()), 3)
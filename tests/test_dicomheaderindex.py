@@ -0,0 +1,36 @@
+"""Tests for barbell2light.dicom.dicomheaderindex."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from barbell2light.dicom.dicomheaderindex import DicomHeaderIndex
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestDicomHeaderIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.dcm_file = os.path.join(self.input_dir, '10.dcm')
+        shutil.copy(os.path.join(DATA_DIR, '10_raw.dcm'), self.dcm_file)
+        self.index = DicomHeaderIndex(os.path.join(self.input_dir, 'index.db'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.input_dir)
+
+    def test_update_is_incremental(self):
+        self.assertEqual(self.index.update([self.dcm_file]), 1)
+        self.assertEqual(self.index.update([self.dcm_file]), 0)
+        self.assertEqual(self.index.get_tag_values('Modality'), {self.dcm_file: 'CT'})
+
+    def test_unreadable_changed_file_is_removed(self):
+        self.index.update([self.dcm_file])
+        with open(self.dcm_file, 'wb') as f:
+            f.write(b'not a DICOM file')
+        self.assertEqual(self.index.update([self.dcm_file]), 0)
+        self.assertEqual(self.index.get_files(), [])
+        self.assertEqual(self.index.get_tag_values('Modality'), {})
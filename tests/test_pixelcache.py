@@ -0,0 +1,24 @@
+"""Tests for barbell2light.dicom.pixelcache."""
+import os
+import unittest
+
+from barbell2light.dicom.pixelcache import get_pixel_cache, disable_pixel_cache, read_dicom_pixels, \
+    DEFAULT_PIXEL_CACHE_MAX_BYTES
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestPixelCache(unittest.TestCase):
+
+    def tearDown(self):
+        get_pixel_cache().set_max_bytes(DEFAULT_PIXEL_CACHE_MAX_BYTES)
+        get_pixel_cache().clear()
+
+    def test_disabled_cache_keeps_no_pixels(self):
+        get_pixel_cache().clear()
+        disable_pixel_cache()
+        pixels = read_dicom_pixels(os.path.join(DATA_DIR, '10_raw.dcm'), normalize=True)
+        self.assertEqual(pixels.shape, (512, 512))
+        self.assertEqual(get_pixel_cache().get_stats()['items'], 0)
+        self.assertEqual(get_pixel_cache().get_stats()['nr_bytes'], 0)
@@ -0,0 +1,57 @@
+"""Tests for barbell2light.dicom.tag2dcm."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from barbell2light.dicom.tag2dcm import Tag2Dcm
+from barbell2light.dicom.tagdecoder import write_tag_file
+from barbell2light.dicom.tagheader import TagHeader
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestTag2Dcm(unittest.TestCase):
+
+    def setUp(self):
+        self.dcm_file = os.path.join(DATA_DIR, '10.dcm')
+        self.tag_file = os.path.join(DATA_DIR, '10.tag')
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def create_overlay(self):
+        pixels_tag = Tag2Dcm.get_tag_pixels(self.dcm_file, self.tag_file)
+        return Tag2Dcm.set_overlay_pixels(Tag2Dcm.read_header(self.dcm_file), Tag2Dcm.get_overlay_pixels(pixels_tag))
+
+    def test_overlays_are_independent(self):
+        p = self.create_overlay()
+        p.BitsAllocated = 16
+        p.PhotometricInterpretation = 'MONOCHROME2'
+        p = self.create_overlay()
+        self.assertEqual(p.BitsAllocated, 8)
+        self.assertEqual(p.PhotometricInterpretation, 'RGB')
+        self.assertEqual(p.pixel_array.shape, (512, 512, 3))
+
+    def test_tag_shape_must_match_dicom(self):
+        tag_file = os.path.join(self.output_dir, '10.tag')
+        write_tag_file(tag_file, np.zeros((256, 256), dtype=np.uint8), TagHeader.from_shape((256, 256)).get_text())
+        t2d = Tag2Dcm()
+        t2d.set_dicom_and_tag_file(self.dcm_file, tag_file)
+        t2d.set_output_dir(self.output_dir)
+        with self.assertRaises(RuntimeError):
+            t2d.execute()
+        self.assertFalse(os.path.exists(tag_file + '.dcm'))
+
+    def test_numpy_shape_must_match_dicom(self):
+        numpy_file = os.path.join(self.output_dir, '10.npy')
+        np.save(numpy_file, np.zeros((256, 256), dtype=np.uint8))
+        t2d = Tag2Dcm()
+        t2d.set_dicom_and_numpy_file(self.dcm_file, numpy_file)
+        t2d.set_output_dir(self.output_dir)
+        with self.assertRaises(RuntimeError):
+            t2d.execute()
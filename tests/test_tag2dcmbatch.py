@@ -0,0 +1,28 @@
+"""Tests for barbell2light.dicom.tag2dcmbatch."""
+import os
+import shutil
+import filecmp
+import tempfile
+import unittest
+
+from barbell2light.dicom.pixelcache import get_pixel_cache
+from barbell2light.dicom.tag2dcmbatch import create_overlay
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestCreateOverlay(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_create_overlay_does_not_decode_dicom_pixels(self):
+        get_pixel_cache().clear()
+        output_file, timings = create_overlay(
+            os.path.join(DATA_DIR, '10.dcm'), os.path.join(DATA_DIR, '10.tag'), self.output_dir)
+        self.assertEqual(get_pixel_cache().get_stats()['items'], 0)
+        self.assertTrue(filecmp.cmp(output_file, os.path.join(DATA_DIR, '10.tag.dcm'), shallow=False))
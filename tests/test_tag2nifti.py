@@ -0,0 +1,51 @@
+"""Tests for barbell2light.dicom.tag2nifti."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pydicom
+import SimpleITK as sitk
+
+from barbell2light.dicom.tag2nifti import Tag2Nifti
+from barbell2light.dicom.tagdecoder import write_tag_file
+from barbell2light.dicom.tagheader import TagHeader
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestTag2Nifti(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def create_series(self, pixel_spacing, nr_slices=3, slice_spacing=3.0):
+        p = pydicom.dcmread(os.path.join(DATA_DIR, '10_raw.dcm'))
+        p.PixelSpacing = pixel_spacing
+        p.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        p.SeriesInstanceUID = pydicom.uid.generate_uid()
+        pairs = []
+        for i in range(nr_slices):
+            dcm_file = os.path.join(self.output_dir, '{}.dcm'.format(i))
+            p.ImagePositionPatient = [0.0, 0.0, i * slice_spacing]
+            p.InstanceNumber = i + 1
+            p.save_as(dcm_file)
+            tag_file = dcm_file + '.tag'
+            write_tag_file(tag_file, np.zeros((p.Rows, p.Columns), dtype=np.uint8),
+                           TagHeader.from_shape((p.Rows, p.Columns)).get_text())
+            pairs.append((dcm_file, tag_file))
+        return pairs
+
+    def test_series_spacing_is_column_row_slice(self):
+        tag2nifti = Tag2Nifti()
+        tag2nifti.set_input_file_pairs(self.create_series([0.5, 0.8]))
+        tag2nifti.set_output_dir(self.output_dir)
+        tag2nifti.execute()
+        image = sitk.ReadImage(tag2nifti.get_output_file_path())
+        np.testing.assert_allclose(image.GetSpacing(), (0.8, 0.5, 3.0))
+        self.assertEqual(image.GetSize(), (512, 512, 3))
@@ -0,0 +1,69 @@
+"""Tests for barbell2light.dicom.tag2numpy."""
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from barbell2light.dicom.tag2numpy import Tag2NumPy
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def read_tag_pixels_per_byte(tag_file_path):
+    """ The original per-byte decoder of Tag2NumPy, kept as reference """
+    with open(tag_file_path, 'rb') as f:
+        byte = f.read(1)
+        while byte != b'':
+            if byte == b'\x0c':
+                break
+            byte = f.read(1)
+        values = []
+        f.read(1)
+        while byte != b'':
+            values.append(struct.unpack('b', byte))
+            byte = f.read(1)
+    return np.asarray(values).astype(np.uint16)
+
+
+class TestTag2NumPy(unittest.TestCase):
+
+    def setUp(self):
+        self.tag_file = os.path.join(DATA_DIR, '10.tag')
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def convert(self, tag_file, shape):
+        converter = Tag2NumPy(shape)
+        converter.set_input_tag_file_path(tag_file)
+        converter.execute()
+        return converter.get_output_numpy_array()
+
+    def assert_same_as_per_byte_decoder(self, tag_file, shape):
+        expected = read_tag_pixels_per_byte(tag_file)
+        pixels = self.convert(tag_file, None)
+        self.assertEqual(pixels.dtype, expected.dtype)
+        np.testing.assert_array_equal(pixels, expected)
+        if shape is not None:
+            np.testing.assert_array_equal(self.convert(tag_file, shape), expected.reshape(shape))
+
+    def test_same_as_per_byte_decoder(self):
+        self.assert_same_as_per_byte_decoder(self.tag_file, (512, 512))
+
+    def test_terminator_and_skipped_byte(self):
+        # The first value is the 0x0c terminator itself, the byte after it is skipped and
+        # bytes above 127 wrap around like signed 8-bit values cast to uint16
+        tag_file = os.path.join(self.output_dir, 'test.tag')
+        with open(tag_file, 'wb') as f:
+            f.write(b'x:2 y:2 z:1 type:BYTE \x0c\x01\x07\x02\xff')
+        self.assert_same_as_per_byte_decoder(tag_file, (2, 2))
+        pixels = self.convert(tag_file, (2, 2))
+        np.testing.assert_array_equal(pixels, [[12, 7], [2, 65535]])
+
+    def test_shape_mismatch(self):
+        self.assertIsNone(self.convert(self.tag_file, (256, 256)))
@@ -0,0 +1,35 @@
+"""Tests for barbell2light.dicom.tag2numpybatch."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from barbell2light.dicom import get_tag_pixels
+from barbell2light.dicom.tag2numpybatch import Tag2NumPyBatch
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestTag2NumPyBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        self.tag_file = os.path.join(self.input_dir, '10.tag')
+        shutil.copy(os.path.join(DATA_DIR, '10.tag'), self.tag_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+        shutil.rmtree(self.output_dir)
+
+    def test_shards_hold_stored_label_bytes(self):
+        converter = Tag2NumPyBatch()
+        converter.set_input_dir(self.input_dir)
+        converter.set_output_dir(self.output_dir)
+        converter.set_nr_workers(1)
+        converter.execute()
+        pixels = Tag2NumPyBatch.load(converter.get_output_index_file_path(), self.tag_file)
+        expected = get_tag_pixels(self.tag_file, shape=(512, 512), mmap=True)
+        self.assertEqual(pixels.shape, (512, 512))
+        self.assertTrue((pixels == expected).all())
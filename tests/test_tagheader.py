@@ -0,0 +1,52 @@
+"""Tests for barbell2light.dicom.tagheader."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+from barbell2light.dicom.tagheader import TagHeader, TagHeaderIndex
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestTagHeader(unittest.TestCase):
+
+    def test_read(self):
+        header = TagHeader.read(os.path.join(DATA_DIR, '10.tag'))
+        self.assertEqual(header.get_shape(), (512, 512))
+        self.assertEqual(header.get_pixel_type(), 'BYTE')
+        self.assertEqual(header.get_spacing(), (0.6758, 0.6758, 3.0))
+
+
+class TestTagHeaderIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.tag_file = os.path.join(self.input_dir, '10.tag')
+        shutil.copy(os.path.join(DATA_DIR, '10.tag'), self.tag_file)
+        self.index = TagHeaderIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+
+    def test_update_is_incremental(self):
+        self.assertEqual(self.index.update(self.input_dir), 1)
+        self.assertEqual(self.index.update(self.input_dir), 0)
+        self.assertEqual(self.index.get_shape(self.tag_file), (512, 512))
+
+    def test_file_deleted_during_walk_is_skipped(self):
+        self.index.update(self.input_dir)
+        walk = [(self.input_dir, [], ['10.tag', 'deleted.tag'])]
+        with mock.patch('barbell2light.dicom.tagheader.os.walk', return_value=walk):
+            self.assertEqual(self.index.update(self.input_dir), 0)
+        self.assertEqual(self.index.get_files(), [self.tag_file])
+
+    def test_unreadable_changed_file_is_removed(self):
+        self.index.update(self.input_dir)
+        with open(self.tag_file, 'wb') as f:
+            f.write(b'no header terminator')
+        self.assertEqual(self.index.update(self.input_dir), 0)
+        self.assertEqual(self.index.get_files(), [])